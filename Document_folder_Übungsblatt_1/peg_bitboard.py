@@ -0,0 +1,207 @@
+import numpy as np
+
+# the only valid jump directions, same order as in Pegboard.get_moves()
+DIRECTIONS = ("up", "right", "down", "left")
+
+
+class BitBoard(object):
+    """
+    Bitboard geometry of a pegboard. A position is a Python int with one bit per field, set bits are pegs.
+    Field (row, col) is bit row * stride + col. Every row has two padding bits, so a jump can never wrap
+    around into the next row, and the masks below never contain padding bits.
+    """
+    def __init__(self, board):
+        """
+        Constructor.
+        :param board: 2D numpy array of a Pegboard (0 free, 1 peg, 2 invalid), only the shape and the invalid
+                      fields are used
+        """
+        self.shape = board.shape
+        self.stride = board.shape[1] + 2
+        self.num_bits = board.shape[0] * self.stride
+
+        # flat bit index of every field of the board
+        rows, cols = np.indices(board.shape)
+        self.bit_index = (rows * self.stride + cols).ravel()
+        self.invalid = np.asarray(board) == 2
+        self.valid = self.encode(~self.invalid)
+
+        # bit offset of the jumped over peg for every direction
+        self.offsets = (-self.stride, 1, self.stride, -1)
+        self._symmetries = self.__symmetry_tables()
+
+    def __symmetry_tables(self):
+        """
+        Private helper to build the lookup tables of the dihedral symmetries that map the board onto itself.
+        Do not call from the outside.
+        A position is mapped 8 bits at a time: table[chunk][byte] holds the mapped bits of that byte, so mapping
+        a position takes one lookup per byte instead of one operation per field.
+        :return: list with one list of byte tables per symmetry (the identity is always the first)
+        """
+        rows, cols = self.shape
+        transforms = [lambda r, c: (r, c), lambda r, c: (r, cols - 1 - c), lambda r, c: (rows - 1 - r, c),
+                      lambda r, c: (rows - 1 - r, cols - 1 - c)]
+        if rows == cols:
+            transforms += [lambda r, c: (c, r), lambda r, c: (c, rows - 1 - r), lambda r, c: (rows - 1 - c, r),
+                           lambda r, c: (rows - 1 - c, rows - 1 - r)]
+
+        result = []
+        for transform in transforms:
+            mapped = [transform(r, c) for r, c in zip(*np.nonzero(~self.invalid))]
+            if any(self.invalid[m] for m in mapped):
+                continue
+            tables = []
+            for chunk in range(0, self.num_bits, 8):
+                single = [0] * 8
+                for b in range(8):
+                    row, col = self.coords(chunk + b)
+                    if row < rows and col < cols and not self.invalid[row, col]:
+                        single[b] = 1 << self.bit(transform(row, col))
+                table = [0] * 256
+                for value in range(1, 256):
+                    low = value & -value
+                    table[value] = table[value ^ low] | single[low.bit_length() - 1]
+                tables.append(table)
+            result.append(tables)
+        return result
+
+    def symmetric(self, pegs):
+        """
+        All images of a position under the symmetries of the board
+        :param pegs: the position as int
+        :return: list of positions, the first one is pegs itself
+        """
+        result = []
+        for tables in self._symmetries:
+            mapped = 0
+            rest = pegs
+            for table in tables:
+                mapped |= table[rest & 255]
+                rest >>= 8
+            result.append(mapped)
+        return result
+
+    def canonical(self, pegs):
+        """
+        Unique representative of a position and all its symmetric positions, used as key of position caches
+        :param pegs: the position as int
+        :return: the smallest symmetric position
+        """
+        return min(self.symmetric(pegs))
+
+    def encode(self, board):
+        """
+        Converts a board array into a position
+        :param board: 2D array, fields equal to 1 (or True) are pegs
+        :return: the position as int
+        """
+        bits = np.zeros(self.num_bits, dtype=np.uint8)
+        bits[self.bit_index] = (np.asarray(board) == 1).ravel()
+        return int.from_bytes(np.packbits(bits, bitorder='little').tobytes(), 'little')
+
+    def decode(self, pegs):
+        """
+        Converts a position back into a board array
+        :param pegs: the position as int
+        :return: 2D uint8 array with 0 free, 1 peg and 2 invalid
+        """
+        data = np.frombuffer(pegs.to_bytes((self.num_bits + 7) // 8, 'little'), dtype=np.uint8)
+        board = np.unpackbits(data, bitorder='little')[self.bit_index].reshape(self.shape)
+        board[self.invalid] = 2
+        return board
+
+    def coords(self, bit):
+        """
+        :param bit: bit index of a field
+        :return: (row, col) of the field
+        """
+        return divmod(bit, self.stride)
+
+    def bit(self, coords):
+        """
+        :param coords: (row, col) of a field
+        :return: bit index of the field, -1 if it is outside the board
+        """
+        row, col = coords
+        if not (0 <= row < self.shape[0] and 0 <= col < self.shape[1]):
+            return -1
+        return row * self.stride + col
+
+    def movable(self, pegs, direction):
+        """
+        All pegs that can jump in one direction, found with three shifts and ANDs
+        :param pegs: the position as int
+        :param direction: index into DIRECTIONS
+        :return: int with a bit set for every peg that can jump
+        """
+        offset = self.offsets[direction]
+        free = self.valid & ~pegs
+        if offset > 0:
+            return pegs & (pegs >> offset) & (free >> (2 * offset))
+        return pegs & (pegs << -offset) & (free << (-2 * offset))
+
+    def moves(self, pegs):
+        """
+        All legal moves of a position
+        :param pegs: the position as int
+        :return: list of (bit index of the jumping peg, direction index) pairs
+        """
+        result = []
+        for direction in range(4):
+            starts = self.movable(pegs, direction)
+            while starts:
+                low = starts & -starts
+                result.append((low.bit_length() - 1, direction))
+                starts ^= low
+        return result
+
+    def mobility(self, pegs):
+        """
+        Number of legal moves of a position, cheaper than len(moves(pegs))
+        :param pegs: the position as int
+        :return: number of legal moves
+        """
+        return sum(bin(self.movable(pegs, direction)).count("1") for direction in range(4))
+
+    def jump(self, pegs, start, direction):
+        """
+        Applies a legal move
+        :param pegs: the position as int
+        :param start: bit index of the jumping peg
+        :param direction: index into DIRECTIONS
+        :return: the new position
+        """
+        offset = self.offsets[direction]
+        return pegs ^ ((1 << start) | (1 << (start + offset)) | (1 << (start + 2 * offset)))
+
+    def to_tuple(self, start, direction):
+        """
+        Converts a move into the (start, jumped, target) format of Pegboard.move()
+        :param start: bit index of the jumping peg
+        :param direction: index into DIRECTIONS
+        :return: tuple with the three (row, col) coordinates
+        """
+        offset = self.offsets[direction]
+        return self.coords(start), self.coords(start + offset), self.coords(start + 2 * offset)
+
+    def from_tuple(self, move):
+        """
+        Converts a move in the format of Pegboard.move() into a bit index and a direction
+        :param move: (start, jumped, target) coordinates
+        :return: (bit index of the jumping peg, direction index), None if the fields are not in a straight line
+                 next to each other or outside the board
+        """
+        start, jumped, target = (self.bit(m) for m in move)
+        if start < 0 or jumped < 0 or target < 0:
+            return None
+        for direction, offset in enumerate(self.offsets):
+            if jumped - start == offset and target - jumped == offset:
+                return start, direction
+        return None
+
+    def count(self, pegs):
+        """
+        :param pegs: the position as int
+        :return: number of pegs
+        """
+        return bin(pegs).count("1")
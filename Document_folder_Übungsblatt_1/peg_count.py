@@ -0,0 +1,253 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from pegboard import Pegboard
+
+# positions of a layer file decoded at once
+CHUNK = 1 << 16
+
+
+class SolutionCounter(object):
+    """
+    Counts the move sequences that leave a single peg. The count of a position is memoized by its canonical
+    form, symmetric positions have the same count. The memo is split into one dict per number of pegs; when
+    it holds more than max_entries positions, the largest layer except the one being written is spilled to a
+    file of sorted keys and counts in folder. A spilled layer is looked up by binary search on the memory
+    mapped file, later spills of the same layer are merged into it.
+    """
+    def __init__(self, bitboard, max_entries=1 << 22, folder=None):
+        """
+        Constructor.
+        :param bitboard: BitBoard of the board geometry
+        :param max_entries: memory budget of the memo in positions
+        :param folder: folder for the spilled layers, None for a temporary folder that close() removes
+        """
+        self.bitboard = bitboard
+        self.max_entries = max_entries
+        self.folder = folder
+        self.layers = {}
+        self.spilled = {}
+        self.entries = 0
+        self.spills = 0
+        self.spilled_entries = 0
+
+        # keys are stored big endian as fixed size bytes, so their byte order is their numeric order
+        self.__nbytes = (bitboard.num_bits + 7) // 8
+        self.__key_type = np.dtype((np.void, self.__nbytes))
+        self.__temp = None
+
+    def count(self, pegs):
+        """
+        :param pegs: the position as int
+        :return: number of move sequences from the position to a single peg
+        """
+        return self.__count(pegs, self.bitboard.count(pegs))
+
+    def close(self):
+        """
+        Removes the spilled layers if they were written to a temporary folder
+        """
+        self.spilled.clear()
+        if self.__temp is not None:
+            shutil.rmtree(self.__temp, ignore_errors=True)
+            self.__temp = None
+
+    def __count(self, pegs, left):
+        """
+        Private helper of count(). Do not call from the outside.
+        :param pegs: the position as int
+        :param left: number of pegs of the position
+        :return: number of move sequences from the position to a single peg
+        """
+        if left == 1:
+            return 1
+        bitboard = self.bitboard
+        key = bitboard.canonical(pegs)
+        layer = self.layers.get(left)
+        if layer is not None and key in layer:
+            return layer[key]
+        if left in self.spilled:
+            total = self.__lookup(left, key)
+            if total is not None:
+                return total
+
+        total = 0
+        for start, direction in bitboard.moves(pegs):
+            total += self.__count(bitboard.jump(pegs, start, direction), left - 1)
+
+        if self.entries >= self.max_entries:
+            self.__spill(left)
+        self.layers.setdefault(left, {})[key] = total
+        self.entries += 1
+        return total
+
+    def __lookup(self, left, key):
+        """
+        Private helper to find a position in a spilled layer. Do not call from the outside.
+        :return: the count or None if the position is not in the file
+        """
+        keys, counts = self.spilled[left]
+        wanted = np.void(key.to_bytes(self.__nbytes, 'big'))
+        i = int(np.searchsorted(keys, wanted))
+        if i < len(keys) and keys[i] == wanted:
+            return int(counts[i, 0]) | (int(counts[i, 1]) << 64)
+        return None
+
+    def __spill(self, left):
+        """
+        Private helper to move the largest layer other than the one being written to disk. Do not call from
+        the outside.
+        :param left: number of pegs of the layer being written, it stays in memory
+        """
+        candidates = [pegs for pegs in self.layers if pegs != left]
+        if not candidates:
+            return
+        victim = max(candidates, key=lambda pegs: len(self.layers[pegs]))
+        layer = self.layers.pop(victim)
+        self.entries -= len(layer)
+        self.spills += 1
+        self.spilled_entries += len(layer)
+
+        keys = np.frombuffer(b''.join(k.to_bytes(self.__nbytes, 'big') for k in layer), dtype=self.__key_type)
+        # counts can exceed 64 bits, they are stored as low and high word
+        mask = (1 << 64) - 1
+        counts = np.array([(c & mask, c >> 64) for c in layer.values()], dtype=np.uint64).reshape((-1, 2))
+        if victim in self.spilled:
+            keys = np.concatenate((self.spilled[victim][0], keys))
+            counts = np.concatenate((self.spilled[victim][1], counts))
+        order = np.argsort(keys, kind='stable')
+
+        if self.folder is None and self.__temp is None:
+            self.__temp = tempfile.mkdtemp(prefix='peg_count')
+        folder = self.folder or self.__temp
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        # a new file per spill, the old one may still be mapped
+        base = os.path.join(folder, 'count{0}_{1}'.format(victim, self.spills))
+        np.save(base + '_keys.npy', keys[order])
+        np.save(base + '_counts.npy', counts[order])
+        old = self.spilled.get(victim)
+        self.spilled[victim] = (np.load(base + '_keys.npy', mmap_mode='r'),
+                                np.load(base + '_counts.npy', mmap_mode='r'))
+        if old is not None:
+            for array in old:
+                os.remove(array.filename)
+
+
+def count_solutions(peg, max_entries=1 << 22, folder=None):
+    """
+    Counts the distinct move sequences that solve the current position of a pegboard
+    :param peg: Pegboard, it is not changed
+    :param max_entries: memory budget of the memo in positions
+    :param folder: folder for the layers spilled over the budget, None for a temporary folder
+    :return: number of solutions
+    """
+    bitboard = peg.bitboard
+    counter = SolutionCounter(bitboard, max_entries, folder)
+    try:
+        return counter.count(bitboard.encode(peg.board))
+    finally:
+        counter.close()
+
+
+def layer_path(peg, pegs, folder):
+    """
+    File name of a layer of reachable positions. The name contains the canonical start position in hex, so the
+    layers of different start positions on the same board never share a file.
+    :param peg: Pegboard at the start position of the enumeration
+    :param pegs: number of pegs of the positions in the layer
+    :param folder: folder the layers are stored in
+    :return: path of the .npy file
+    """
+    bitboard = peg.bitboard
+    fields = int((peg.board != 2).sum())
+    start = bitboard.canonical(bitboard.encode(peg.board))
+    return os.path.join(folder, 'reachable{0}_{1}_{2:x}_{3}.npy'.format(peg.board.shape[0], fields, start, pegs))
+
+
+def save_layer(positions, nbytes, path):
+    """
+    Stores a set of positions sorted, each as nbytes little endian bytes
+    :param positions: iterable of positions as int
+    :param nbytes: bytes per position
+    :param path: path of the .npy file
+    :return: number of positions
+    """
+    data = b''.join(p.to_bytes(nbytes, 'little') for p in sorted(positions))
+    table = np.frombuffer(data, dtype=np.uint8).reshape((-1, nbytes))
+    folder = os.path.dirname(path)
+    if folder and not os.path.isdir(folder):
+        os.makedirs(folder)
+    np.save(path, table)
+    return table.shape[0]
+
+
+def read_layer(path):
+    """
+    Reads the positions of a layer file chunk by chunk, the file is memory mapped
+    :param path: path of a file written by save_layer()
+    :return: generator of positions as int
+    """
+    table = np.load(path, mmap_mode='r')
+    nbytes = table.shape[1]
+    for start in range(0, table.shape[0], CHUNK):
+        data = table[start:start + CHUNK].tobytes()
+        for i in range(0, len(data), nbytes):
+            yield int.from_bytes(data[i:i + nbytes], 'little')
+
+
+def enumerate_layers(peg, folder=None):
+    """
+    Breadth first enumeration of all positions reachable from the current position of a pegboard. Every move
+    removes one peg, so the positions with the same number of pegs form one layer. Only the layer being built
+    is held in memory, the previous one is read back from its file. Of several symmetric positions only the
+    canonical one is stored.
+    :param peg: Pegboard, it is not changed
+    :param folder: folder the layer files are written to, None for a new temporary folder. The files are kept
+                   after the call, the caller removes them.
+    :return: list of (number of pegs, number of positions, path of the layer file)
+    """
+    if folder is None:
+        folder = tempfile.mkdtemp(prefix='peg_layers')
+    bitboard = peg.bitboard
+    nbytes = (bitboard.num_bits + 7) // 8
+    start = bitboard.encode(peg.board)
+    left = bitboard.count(start)
+
+    path = layer_path(peg, left, folder)
+    layers = [(left, save_layer([bitboard.canonical(start)], nbytes, path), path)]
+    while left > 1:
+        layer = set()
+        for pegs in read_layer(path):
+            for s, direction in bitboard.moves(pegs):
+                layer.add(bitboard.canonical(bitboard.jump(pegs, s, direction)))
+        if not layer:
+            break
+        left -= 1
+        path = layer_path(peg, left, folder)
+        layers.append((left, save_layer(layer, nbytes, path), path))
+    return layers
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Counts peg solitaire solutions and reachable positions")
+    parser.add_argument('size_outer', type=int, nargs='?', default=7, help="total size of the board")
+    parser.add_argument('size_inner', type=int, nargs='?', default=3, help="width of the arms")
+    parser.add_argument('--layers', action='store_true', help="enumerate the reachable positions per peg count")
+    parser.add_argument('--max-entries', type=int, default=1 << 22, help="memory budget of the memo in positions")
+    parser.add_argument('--folder', default=None, help="folder for the layer files, a temporary folder if omitted")
+    args = parser.parse_args()
+
+    peg = Pegboard(args.size_outer, args.size_inner)
+    start = time.perf_counter()
+    if args.layers:
+        for pegs, positions, path in enumerate_layers(peg, args.folder):
+            print("{0:>3} pegs: {1:>10} positions ({2})".format(pegs, positions, path))
+    else:
+        print("solutions:", count_solutions(peg, args.max_entries))
+    print("{0:.2f} s".format(time.perf_counter() - start))
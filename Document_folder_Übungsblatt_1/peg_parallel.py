@@ -0,0 +1,193 @@
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from peg_bitboard import BitBoard
+from pegboard import Pegboard
+from peg_solver import final_fields, ordered_moves, search
+
+# state of the worker process, set up by _init_worker()
+_worker = {}
+
+
+class _ExchangeSet(set):
+    """
+    Dead position cache of a worker process that also collects the dead positions to send to the other workers.
+    A limit on the number of pegs keeps the positions deep in the tree, the most numerous ones, to this worker.
+    """
+    def __init__(self, min_pegs):
+        """
+        Constructor.
+        :param min_pegs: dead positions with at least this many pegs are collected in found
+        """
+        set.__init__(self)
+        self.min_pegs = min_pegs
+        self.found = []
+
+    def add(self, key):
+        set.add(self, key)
+        if bin(key).count("1") >= self.min_pegs:
+            self.found.append(key)
+
+
+def opening(bitboard, pegs, plies):
+    """
+    Expands the first plies of the game tree breadth first. Of several symmetric positions only one is kept.
+    :param bitboard: BitBoard of the board geometry
+    :param pegs: the start position as int
+    :param plies: number of moves to expand
+    :return: list of (moves, position) pairs, moves are the (bit index, direction index) pairs leading from
+             pegs to the position
+    """
+    layer = [([], pegs)]
+    for _ in range(plies):
+        seen = set()
+        expanded = []
+        for moves, position in layer:
+            if position & (position - 1) == 0:
+                # already solved within the opening
+                return [(moves, position)]
+            for start, direction in ordered_moves(bitboard, position):
+                child = bitboard.jump(position, start, direction)
+                key = bitboard.canonical(child)
+                if key not in seen:
+                    seen.add(key)
+                    expanded.append((moves + [(start, direction)], child))
+        if not expanded:
+            break
+        layer = expanded
+    return layer
+
+
+def _init_worker(board, min_pegs, stop, folder):
+    """
+    Sets up the board geometry, the dead position cache and the dead position file of a worker process.
+    Private helper, do not call from the outside
+    """
+    bitboard = BitBoard(board)
+    _worker['bitboard'] = bitboard
+    _worker['dead'] = _ExchangeSet(min_pegs)
+    _worker['stop'] = stop
+    _worker['width'] = (bitboard.num_bits + 7) // 8
+    _worker['folder'] = folder
+    _worker['name'] = "{0}.bin".format(os.getpid())
+    _worker['file'] = open(os.path.join(folder, _worker['name']), 'ab')
+    # open files of the other workers, by file name
+    _worker['others'] = {}
+
+
+def _exchange():
+    """
+    Appends the dead positions collected since the last call to the file of this worker and adds the ones the
+    other workers have appended to their files since then. Every file has a single writer, a record that is only
+    partly written yet is read with the next call. Private helper, do not call from the outside
+    """
+    dead = _worker['dead']
+    width = _worker['width']
+    if dead.found:
+        _worker['file'].write(b''.join(key.to_bytes(width, 'little') for key in dead.found))
+        _worker['file'].flush()
+        dead.found = []
+    others = _worker['others']
+    for name in os.listdir(_worker['folder']):
+        if name != _worker['name'] and name not in others:
+            others[name] = open(os.path.join(_worker['folder'], name), 'rb')
+    for f in others.values():
+        data = f.read()
+        rest = len(data) % width
+        if rest:
+            f.seek(-rest, os.SEEK_CUR)
+        # positions from the other workers are not collected again
+        set.update(dead, (int.from_bytes(data[i:i + width], 'little') for i in range(0, len(data) - rest, width)))
+
+
+def _solve_subtree(pegs):
+    """
+    Searches the subtree below one opening position in a worker process. Dead positions are exchanged with the
+    other workers every peg_solver.STOP_INTERVAL nodes. Private helper, do not call from the outside
+    :param pegs: the opening position as int
+    :return: list of moves, None if there is no solution below the position or the search was stopped
+    """
+    if _worker['stop'].is_set():
+        return None
+    _exchange()
+    moves = search(_worker['bitboard'], pegs, _worker['dead'], _worker['stop'], poll=_exchange)
+    if moves is not None:
+        _worker['stop'].set()
+    else:
+        _exchange()
+    return moves
+
+
+def solve_parallel(peg, workers=None, plies=4, exchange_depth=None):
+    """
+    Solves the current position of a pegboard with a process pool. The first plies are expanded here, the
+    subtrees below the remaining positions are searched by the workers. Every worker has its own dead position
+    cache; the dead positions close to the subtree roots are appended to a file per worker in a temporary folder
+    while the search goes on, and every worker regularly reads what the others have appended. All workers stop as
+    soon as one of them finds a solution.
+    :param peg: Pegboard, it is not changed
+    :param workers: number of worker processes, defaults to the number of cores
+    :param plies: number of moves expanded before the subtrees are distributed
+    :param exchange_depth: dead positions at most this many moves below a subtree root are shared, None shares
+                           all of them. Every worker keeps the shared positions of all the others, so with many
+                           workers a limit saves memory. On 9x3 the positions found in the first minutes have at
+                           most half of the pegs of a subtree root, and only those with fewer than 15 pegs are met
+                           again by other workers.
+    :return: list of moves in the (start, jumped, target) format of Pegboard.move(), None if there is no solution
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    bitboard = peg.bitboard
+    pegs = bitboard.encode(peg.board)
+    if not final_fields(bitboard, pegs):
+        return None
+    tasks = opening(bitboard, pegs, plies)
+    min_pegs = 0 if exchange_depth is None else bitboard.count(pegs) - plies - exchange_depth
+
+    stop = multiprocessing.Event()
+    folder = tempfile.mkdtemp(prefix='peg_dead')
+    solution = None
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(peg.board, min_pegs, stop, folder)) as pool:
+            pending = dict((pool.submit(_solve_subtree, position), moves) for moves, position in tasks)
+            for future in as_completed(pending):
+                moves = future.result()
+                if moves is not None:
+                    solution = pending[future] + moves
+                    stop.set()
+                    for other in pending:
+                        other.cancel()
+                    break
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    if solution is None:
+        return None
+    return [bitboard.to_tuple(start, direction) for start, direction in solution]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solves peg solitaire from the start position with all cores")
+    parser.add_argument('size_outer', type=int, nargs='?', default=7, help="total size of the board")
+    parser.add_argument('size_inner', type=int, nargs='?', default=3, help="width of the arms")
+    parser.add_argument('--workers', type=int, default=None, help="number of processes, all cores if omitted")
+    parser.add_argument('--plies', type=int, default=4, help="moves expanded before splitting the tree")
+    args = parser.parse_args()
+
+    peg = Pegboard(args.size_outer, args.size_inner)
+    start = time.perf_counter()
+    solution = solve_parallel(peg, args.workers, args.plies)
+    print("searched {0:.2f} s".format(time.perf_counter() - start))
+    if solution is None:
+        print("no solution")
+    else:
+        for move in solution:
+            print("making move", move)
+            peg.move(move)
+        print(peg.board)
@@ -0,0 +1,132 @@
+import argparse
+import time
+
+import numpy as np
+
+from pegboard import Pegboard
+
+# row and column step of the jumped over peg per direction, same order as peg_bitboard.DIRECTIONS
+STEPS = ((-1, 0), (0, 1), (1, 0), (0, -1))
+
+
+def jump_table(board):
+    """
+    All jumps that fit the geometry of a board, no matter where the pegs are
+    :param board: 2D board array, only the invalid fields (2) are used
+    :return: (3, M) int array with the flat field indices of the jumping peg, the jumped over peg and the target
+             of every jump
+    """
+    rows, cols = board.shape
+    table = []
+    for r, c in zip(*np.nonzero(board != 2)):
+        for dr, dc in STEPS:
+            if 0 <= r + 2 * dr < rows and 0 <= c + 2 * dc < cols and board[r + dr, c + dc] != 2 \
+                    and board[r + 2 * dr, c + 2 * dc] != 2:
+                table.append((r * cols + c, (r + dr) * cols + c + dc, (r + 2 * dr) * cols + c + 2 * dc))
+    return np.array(table, dtype=np.intp).reshape((-1, 3)).T
+
+
+def legal_moves(fields, table):
+    """
+    Legal moves of many boards at once
+    :param fields: (size * size, N) uint8 array with one board per column (0 free, 1 peg, 2 invalid)
+    :param table: result of jump_table()
+    :return: (M, N) bool array, True where jump m of the table is legal on board n
+    """
+    pegs = fields == 1
+    return pegs[table[0]] & pegs[table[1]] & (fields[table[2]] == 0)
+
+
+def play(boards, rng=np.random):
+    """
+    Plays random games on all boards until none of them has a legal move left. Every step makes one uniformly
+    chosen legal move on every board that still has one. All boards must have the same geometry.
+    :param boards: (N, size, size) uint8 array with 0 free, 1 peg and 2 invalid, changed in place
+    :param rng: numpy random generator or np.random (default, so np.random.seed() applies)
+    :return: uint8 array with the number of pegs left on every board
+    """
+    n = boards.shape[0]
+    table = jump_table(boards[0])
+    # a board has at most M legal moves, a small dtype keeps the running counts cheap
+    dtype = np.uint8 if table.shape[1] < 256 else np.uint16
+
+    # one board per column, so looking up a field of all boards reads one contiguous row
+    fields = np.ascontiguousarray(boards.reshape((n, -1)).T)
+    active = np.arange(n)
+    while len(active):
+        legal = legal_moves(fields, table)
+
+        # running number of legal moves over the jump table, row by row since np.cumsum() casts slowly
+        ranks = np.empty(legal.shape, dtype=dtype)
+        ranks[0] = legal[0]
+        for m in range(1, len(legal)):
+            np.add(ranks[m - 1], legal[m], out=ranks[m])
+        counts = ranks[-1]
+
+        # drop the finished boards once enough of them piled up, copying the fields is not free
+        finished = counts == 0
+        if finished.all() or 4 * finished.sum() > len(active):
+            boards.reshape((n, -1))[active[finished]] = fields[:, finished].T
+            keep = ~finished
+            active, counts, ranks = active[keep], counts[keep], ranks[:, keep]
+            fields = np.ascontiguousarray(fields[:, keep])
+            if not len(active):
+                break
+
+        # the k-th legal move of every board with k uniform in [0, counts), boards without moves make none
+        choice = (rng.random(len(active)) * counts).astype(dtype)
+        index = np.zeros(len(active), dtype=np.intp)
+        for m in range(len(ranks) - 1):
+            index += ranks[m] <= choice
+        games = np.flatnonzero(counts)
+        index = index[games]
+        fields[table[0, index], games] = 0
+        fields[table[1, index], games] = 0
+        fields[table[2, index], games] = 1
+    return (boards == 1).sum(axis=(1, 2)).astype(np.uint8)
+
+
+def playouts(peg, n, batch=1 << 16, rng=np.random):
+    """
+    Plays many random games from the current position of a pegboard
+    :param peg: Pegboard, it is not changed
+    :param n: number of games
+    :param batch: number of games played at once, limits the memory
+    :param rng: numpy random generator or np.random (default, so np.random.seed() applies)
+    :return: uint8 array with the number of pegs left after every game
+    """
+    result = np.empty(n, dtype=np.uint8)
+    for start in range(0, n, batch):
+        count = min(batch, n - start)
+        boards = np.repeat(peg.board[None, :, :], count, axis=0)
+        result[start:start + count] = play(boards, rng)
+    return result
+
+
+def statistics(left):
+    """
+    Summary of the results of playouts()
+    :param left: number of pegs left after every game
+    :return: dict with the number of games, the win rate (one peg left) and the number of games per number of
+             pegs left
+    """
+    histogram = np.bincount(left)
+    return {'games': len(left), 'win_rate': histogram[1] / float(len(left)) if len(histogram) > 1 else 0.0,
+            'pegs_left': {int(k): int(v) for k, v in enumerate(histogram) if v}}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Statistics of random peg solitaire games")
+    parser.add_argument('size_outer', type=int, nargs='?', default=7, help="total size of the board")
+    parser.add_argument('size_inner', type=int, nargs='?', default=3, help="width of the arms")
+    parser.add_argument('--games', type=int, default=1000000, help="number of random games")
+    parser.add_argument('--seed', type=int, default=None, help="seed of the random generator")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = statistics(playouts(Pegboard(args.size_outer, args.size_inner), args.games,
+                                rng=np.random.default_rng(args.seed)))
+    print("{0} games in {1:.2f} s, win rate {2:.6f}".format(stats['games'], time.perf_counter() - start,
+                                                              stats['win_rate']))
+    for pegs, games in sorted(stats['pegs_left'].items()):
+        print("{0:>3} pegs left: {1}".format(pegs, games))
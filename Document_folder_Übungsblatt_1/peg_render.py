@@ -0,0 +1,115 @@
+import argparse
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import EllipseCollection
+from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.figure import Figure
+
+from render_animation import write_animation
+
+
+class PegRenderer(object):
+    """
+    Draws pegboard states with a single collection artist for all pegs. The board itself is drawn once, its
+    pixels are cached, and every later frame only restores them and draws the pegs again (blitting).
+    Without a figure the renderer draws offscreen on an Agg canvas, no GUI backend is needed.
+    """
+    def __init__(self, board, fig=None):
+        """
+        Constructor.
+        :param board: 2D numpy array of a Pegboard, only the invalid fields (2) are drawn here
+        :param fig: matplotlib figure to draw into (e.g. plt.figure()), None to draw offscreen
+        """
+        if fig is None:
+            fig = Figure()
+            FigureCanvasAgg(fig)
+        self.fig = fig
+        self.ax = fig.add_subplot(111)
+
+        # same look as Pegboard.plot_state()
+        colors = [(1.0, 1.0, 1.0, 1.0), (1.0, 1.0, 1.0, 1.0), (0.0, 0.0, 0.0, 1.0)]
+        cmap = LinearSegmentedColormap.from_list('Custom cmap', colors, 3)
+        self.ax.imshow(board.T, cmap=cmap, interpolation='nearest', vmin=0, vmax=2)
+        locs = np.arange(board.shape[0])
+        for axis in [self.ax.xaxis, self.ax.yaxis]:
+            axis.set_ticks(locs + 0.5, minor=True)
+            axis.set(ticks=locs, ticklabels=locs)
+        self.ax.grid(True, which='minor')
+
+        # circles with a radius of 0.4 fields, animated artists are left out of full redraws
+        self.pegs = EllipseCollection(0.8, 0.8, 0.0, units='xy', offsets=np.zeros((0, 2)),
+                                      offset_transform=self.ax.transData, facecolors='black',
+                                      edgecolors='black', animated=True)
+        self.ax.add_collection(self.pegs)
+
+        self.background = None
+        self.fig.canvas.mpl_connect('draw_event', self.__on_draw)
+
+    def __on_draw(self, event):
+        """
+        Private helper to cache the board pixels after every full redraw (first frame, resizing).
+        Do not call from the outside.
+        """
+        self.background = self.fig.canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.pegs)
+
+    def draw(self, board):
+        """
+        Draws a board state
+        :param board: 2D numpy array of a Pegboard with the same geometry as in the constructor
+        """
+        self.pegs.set_offsets(np.argwhere(board.T == 1))
+        canvas = self.fig.canvas
+        if self.background is None:
+            canvas.draw()
+        else:
+            canvas.restore_region(self.background)
+            self.ax.draw_artist(self.pegs)
+            canvas.blit(self.ax.bbox)
+        canvas.flush_events()
+
+    def frame(self, board):
+        """
+        Draws a board state and returns the pixels
+        :param board: 2D numpy array of a Pegboard
+        :return: (height, width, 4) uint8 RGBA array
+        """
+        self.draw(board)
+        return np.array(self.fig.canvas.buffer_rgba())
+
+
+def render_solution(board, moves, path, fps=4):
+    """
+    Writes an animation of a move sequence offscreen
+    :param board: 2D numpy array of the start state of a Pegboard, it is not changed
+    :param moves: list of moves in the (start, jumped, target) format of Pegboard.move()
+    :param path: output file (.gif or e.g. .mp4)
+    :param fps: moves per second
+    """
+    renderer = PegRenderer(board)
+    board = board.copy()
+
+    def frames():
+        yield renderer.frame(board)
+        for start, jumped, target in moves:
+            board[tuple(start)] = 0
+            board[tuple(jumped)] = 0
+            board[tuple(target)] = 1
+            yield renderer.frame(board)
+
+    write_animation(frames(), path, fps)
+
+
+if __name__ == "__main__":
+    from pegboard import Pegboard
+    from peg_solver import solve
+
+    parser = argparse.ArgumentParser(description="Writes an animation of a peg solitaire solution")
+    parser.add_argument('path', nargs='?', default='solution.gif', help="output file (.gif or e.g. .mp4)")
+    parser.add_argument('--fps', type=int, default=4, help="moves per second")
+    args = parser.parse_args()
+
+    peg = Pegboard(7, 3)
+    render_solution(peg.board, solve(peg), args.path, args.fps)
+    print("written", args.path)
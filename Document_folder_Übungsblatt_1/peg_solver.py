@@ -0,0 +1,159 @@
+import argparse
+import time
+
+from pegboard import Pegboard
+
+# nodes searched between two looks at the stop event of a parallel search
+STOP_INTERVAL = 1024
+
+
+def ordered_moves(bitboard, pegs):
+    """
+    Legal moves of a position, the moves that leave the most moves open come first. Keeping the board mobile
+    avoids dead ends early, so a solution is usually found after a small part of the tree.
+    :param bitboard: BitBoard of the board geometry
+    :param pegs: the position as int
+    :return: list of (bit index of the jumping peg, direction index) pairs
+    """
+    moves = bitboard.moves(pegs)
+    moves.sort(key=lambda m: bitboard.mobility(bitboard.jump(pegs, m[0], m[1])), reverse=True)
+    return moves
+
+
+def position_classes(bitboard, pegs):
+    """
+    Parities of the de Bruijn position classes. The fields are split into three classes by (row + col) mod 3 and
+    into three by (row - col) mod 3. Every jump changes the number of pegs in each class of both splits by one, so
+    whether two classes hold the same parity of pegs never changes during a game.
+    :param bitboard: BitBoard of the board geometry
+    :param pegs: the position as int
+    :return: tuple of four bools, the parity differences of class 0 and 1 and of class 1 and 2 of both splits
+    """
+    counts = [[0, 0, 0], [0, 0, 0]]
+    while pegs:
+        bit = (pegs & -pegs).bit_length() - 1
+        pegs &= pegs - 1
+        row, col = bitboard.coords(bit)
+        counts[0][(row + col) % 3] += 1
+        counts[1][(row - col) % 3] += 1
+    return tuple(bool((c[i] ^ c[i + 1]) & 1) for c in counts for i in (0, 1))
+
+
+def final_fields(bitboard, pegs):
+    """
+    Fields the last peg can end on, following position_classes(). A position is unsolvable if the list is empty,
+    e.g. the start position of the 9x5 board.
+    :param bitboard: BitBoard of the board geometry
+    :param pegs: the position as int
+    :return: list of bit indices
+    """
+    classes = position_classes(bitboard, pegs)
+    fields = bitboard.valid
+    result = []
+    while fields:
+        bit = (fields & -fields).bit_length() - 1
+        fields &= fields - 1
+        if position_classes(bitboard, 1 << bit) == classes:
+            result.append(bit)
+    return result
+
+
+class _StopCheck(object):
+    """
+    Looks at a multiprocessing.Event only every interval nodes, asking the event takes a lock and costs more than
+    a node of the search. Once the event was seen set, the check stays aborted. The optional poll function is
+    called at the same interval.
+    """
+    def __init__(self, stop, interval, poll=None):
+        self.stop = stop
+        self.interval = interval
+        self.poll = poll
+        self.remaining = interval
+        self.aborted = False
+
+    def __call__(self):
+        self.remaining -= 1
+        if self.remaining <= 0:
+            self.remaining = self.interval
+            if self.poll is not None:
+                self.poll()
+            if self.stop is not None:
+                self.aborted = self.aborted or self.stop.is_set()
+        return self.aborted
+
+
+def _search(bitboard, pegs, dead, stopped):
+    """
+    Recursion of search(). Private helper, do not call from the outside
+    :param stopped: _StopCheck or None
+    """
+    if pegs & (pegs - 1) == 0:
+        return []
+    key = bitboard.canonical(pegs)
+    if key in dead or (stopped is not None and stopped()):
+        return None
+    for start, direction in ordered_moves(bitboard, pegs):
+        rest = _search(bitboard, bitboard.jump(pegs, start, direction), dead, stopped)
+        if rest is not None:
+            rest.insert(0, (start, direction))
+            return rest
+    # an aborted search did not look at all moves
+    if stopped is None or not stopped.aborted:
+        dead.add(key)
+    return None
+
+
+def search(bitboard, pegs, dead, stop=None, check_interval=STOP_INTERVAL, poll=None):
+    """
+    Depth first search for a sequence of moves that leaves a single peg. Every position without a solution is
+    stored in dead by its canonical form, so positions that are symmetric to a known dead end are skipped too.
+    :param bitboard: BitBoard of the board geometry
+    :param pegs: the position as int
+    :param dead: set of canonical positions known to have no solution, extended in place
+    :param stop: optional multiprocessing.Event, the search gives up soon after it is set
+    :param check_interval: number of nodes between two looks at stop
+    :param poll: optional function without arguments called every check_interval nodes, it may add positions
+                 without a solution to dead, e.g. ones found by other processes
+    :return: list of (bit index of the jumping peg, direction index) pairs, None if there is no solution
+    """
+    stopped = None
+    if stop is not None or poll is not None:
+        stopped = _StopCheck(stop, check_interval, poll)
+    return _search(bitboard, pegs, dead, stopped)
+
+
+def solve(peg, dead=None):
+    """
+    Solves the current position of a pegboard
+    :param peg: Pegboard, it is not changed
+    :param dead: optional set of canonical dead positions of the same board geometry, reused and extended
+    :return: list of moves in the (start, jumped, target) format of Pegboard.move(), None if there is no solution
+    """
+    bitboard = peg.bitboard
+    pegs = bitboard.encode(peg.board)
+    if not final_fields(bitboard, pegs):
+        return None
+    moves = search(bitboard, pegs, set() if dead is None else dead)
+    if moves is None:
+        return None
+    return [bitboard.to_tuple(start, direction) for start, direction in moves]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solves peg solitaire from the start position")
+    parser.add_argument('size_outer', type=int, nargs='?', default=7, help="total size of the board")
+    parser.add_argument('size_inner', type=int, nargs='?', default=3, help="width of the arms")
+    args = parser.parse_args()
+
+    peg = Pegboard(args.size_outer, args.size_inner)
+    dead = set()
+    start = time.perf_counter()
+    solution = solve(peg, dead)
+    print("searched {0:.2f} s, {1} dead positions".format(time.perf_counter() - start, len(dead)))
+    if solution is None:
+        print("no solution")
+    else:
+        for move in solution:
+            print("making move", move)
+            peg.move(move)
+        print(peg.board)
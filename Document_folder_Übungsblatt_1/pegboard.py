@@ -1,8 +1,22 @@
+import os
+
 import numpy as np
-import matplotlib
-matplotlib.use('Qt5Agg') # for PyCharm
-import matplotlib.pyplot as plt
-from matplotlib.colors import LinearSegmentedColormap
+
+from peg_bitboard import BitBoard
+
+
+def _pyplot():
+    """
+    Imports pyplot on the first plot, so boards and solvers work with numpy alone and without a display.
+    Private helper, do not call from the outside
+    :return: the matplotlib.pyplot module
+    """
+    import matplotlib
+    if 'MPLBACKEND' not in os.environ:
+        matplotlib.use('Qt5Agg') # for PyCharm
+    import matplotlib.pyplot as plt
+    return plt
+
 
 class Pegboard(object):
     """
@@ -16,10 +30,10 @@ class Pegboard(object):
         :param size_inner: the width of boards "arms".
         """
 
-        self.fig = None
-        self.ax = None
-        self.peg_circles = None
+        self.renderer = None
         self.board = self.__create_board(size_outer, size_inner)
+        # masks and shifts for the move generation, the geometry never changes
+        self.bitboard = BitBoard(self.board)
 
     def __create_board(self, size_outer, size_inner):
         """
@@ -48,13 +62,9 @@ class Pegboard(object):
         :return: List with all valid moves in the form:
               [(<coordinates of the jumping peg>, <coordinates of the jumped over peg>, <coordinates of the free space to jump to>]
         """
-
-        # TODO Implement this!
-        # This are the only valid moves!
-        validMoves = [ "up", "right", "down", "left" ]
-        moves = []
-
-        return moves
+        bitboard = self.bitboard
+        pegs = bitboard.encode(self.board)
+        return [bitboard.to_tuple(start, direction) for start, direction in bitboard.moves(pegs)]
 
     def move(self, move):
         """
@@ -81,13 +91,11 @@ class Pegboard(object):
         if len(move[0]) != 2:
             raise ValueError("A valid move requires 2D indices")
 
-        start = np.asarray(move[0])
-        jumped = np.asarray(move[1])
-        target = np.asarray(move[2])
-        total_dist = np.sum(np.abs(start-jumped)) + np.sum(np.abs(jumped-target))
-        if self.board[move[0]] != 1 or self.board[move[1]] != 1 or self.board[move[2]] != 0 or total_dist != 2:
+        # the three fields must be neighbors in a straight line on the board
+        if self.bitboard.from_tuple(move) is None:
             return False
-        return True
+        start, jumped, target = (tuple(m) for m in move)
+        return self.board[start] == 1 and self.board[jumped] == 1 and self.board[target] == 0
 
     def finished(self):
         """
@@ -101,40 +109,17 @@ class Pegboard(object):
         plots the current board state using matplotlib
         :param interactive: if True the function will reuse the plot from a previous call. If false a new plot will be generated for each call
         """
+        from peg_render import PegRenderer
+        plt = _pyplot()
         if interactive:
             plt.ion()
 
         # if this is the first time this function is called
-        if not interactive or self.fig is None:
-            self.fig = plt.figure()
-            self.ax = self.fig.add_subplot(111)
-
-            # plot the board and ignore the peg positions
-            colors = [(1.0, 1.0, 1.0, 1.0), (1.0, 1.0, 1.0, 1.0), (0.0, 0.0, 0.0, 1.0)]
-            cmap = LinearSegmentedColormap.from_list('Custom cmap', colors, 3)
-            self.ax.clear()
-            self.ax.imshow(self.board.T, cmap=cmap, interpolation='nearest')
-            # Shift grid to be at 0.5, 1.5, etc
-            locs = np.arange(self.board.shape[0])
-            for axis in [self.ax.xaxis, self.ax.yaxis]:
-                axis.set_ticks(locs + 0.5, minor=True)
-                axis.set(ticks=locs, ticklabels=locs)
-            self.ax.grid(True, which='minor')
-        else:
-            # just remove the previous peg positions
-            for circ in self.peg_circles:
-                circ.remove()
-        # plot the peg positions as circles
-        peg_rows, peg_cols = np.where(self.board.T == 1)
-        self.peg_circles = []
-        for pos in zip(peg_rows, peg_cols):
-            circ = plt.Circle((pos), 0.4, color='black')
-            circ.set_edgecolor('black')
-            self.ax.add_artist(circ)
-            self.peg_circles.append(circ)
-
-        plt.draw()
-        plt.pause(1e-6)
+        if not interactive or self.renderer is None:
+            self.renderer = PegRenderer(self.board, plt.figure())
+            plt.show(block=False)
+        # only the pegs are drawn again, the board is restored from the cached background
+        self.renderer.draw(self.board)
 
 
 if __name__ == "__main__":
@@ -164,4 +149,4 @@ if __name__ == "__main__":
     peg.plot_state()
 
     # keep the last figure
-    plt.show(block=True)
+    _pyplot().show(block=True)
@@ -0,0 +1,38 @@
+import subprocess
+
+
+def write_animation(frames, path, fps=4):
+    """
+    Writes frames to a GIF (with Pillow) or to any video format ffmpeg knows, e.g. MP4. The exercise folders
+    Übungsblatt_1 (peg_render) and Übungsblatt_2 (puzzle_render) each have the same copy of this file.
+    :param frames: iterable of (height, width, 4) uint8 RGBA arrays of the same size
+    :param path: output file, the extension selects the format
+    :param fps: frames per second
+    """
+    frames = iter(frames)
+    first = next(frames)
+    if path.lower().endswith('.gif'):
+        # Pillow collects all frames of a GIF before it writes the file, so they are converted one by one but
+        # all end up in memory (as RGB images). Use a video format for long animations.
+        from PIL import Image
+        images = (Image.fromarray(f).convert('RGB') for f in frames)
+        Image.fromarray(first).convert('RGB').save(path, save_all=True, append_images=images,
+                                                   duration=int(1000 / fps), loop=0)
+        return
+
+    # raw frames go to ffmpeg through a pipe, so video animations are never held in memory. matplotlib is only
+    # needed for the configured path of ffmpeg, so it is imported as late as the other optional packages
+    import matplotlib
+    height, width = first.shape[:2]
+    command = [matplotlib.rcParams['animation.ffmpeg_path'], '-y', '-loglevel', 'error', '-f', 'rawvideo',
+               '-pix_fmt', 'rgba', '-s', '{0}x{1}'.format(width, height), '-r', str(fps), '-i', '-',
+               '-pix_fmt', 'yuv420p', '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', path]
+    process = subprocess.Popen(command, stdin=subprocess.PIPE)
+    try:
+        process.stdin.write(first.tobytes())
+        for f in frames:
+            process.stdin.write(f.tobytes())
+    finally:
+        process.stdin.close()
+    if process.wait() != 0:
+        raise RuntimeError("ffmpeg failed to write {0}".format(path))
@@ -1,15 +1,29 @@
+import os
+
 import numpy as np
-import matplotlib
-matplotlib.use('Qt5Agg') # for PyCharm
-import matplotlib.pyplot as plt
-from matplotlib.colors import LinearSegmentedColormap
-from copy import deepcopy
+from puzzle_moves import MOVES, apply_move, neighbor_table
+from puzzle_pdb import idastar
+from puzzle_random import is_solvable, random_state
+from puzzle_solver import astar, bidirectional
+from puzzle_state import encode
+from puzzle_table import load_table, solve_with_table
+
+# global renderer of the plot to conserve memory
+renderer = None
+
+
+def _pyplot():
+    """
+    Imports pyplot on the first plot, so boards and solvers work with numpy alone and without a display.
+    Private helper, do not call from the outside
+    :return: the matplotlib.pyplot module
+    """
+    import matplotlib
+    if 'MPLBACKEND' not in os.environ:
+        matplotlib.use('Qt5Agg') # for PyCharm
+    import matplotlib.pyplot as plt
+    return plt
 
-# global variables for the plot to conserve memory
-fig = None
-ax = None
-texts = []
-implot = None
 
 class Board(object):
     def __init__(self, width=4, inputs=None):
@@ -48,41 +62,19 @@ class Board(object):
         plots the current board state using matplotlib
         :param interactive: if True the function will reuse the plot from a previous call. If false a new plot will be generated for each call
         """
-        global fig
-        global ax
-        global texts
-        global implot
+        global renderer
+        from puzzle_render import PuzzleRenderer
 
+        plt = _pyplot()
         if interactive:
             plt.ion()
 
         # if this is the first time this function is called
-        if not interactive or fig is None:
-            fig = plt.figure()
-            ax = fig.add_subplot(111)
-            colors = [(0.0, 0.0, 0.0, 1.0), (1.0, 1.0, 1.0, 1.0)]
-            cmap = LinearSegmentedColormap.from_list('Custom cmap', colors,2)
-            ax.clear()
-            state = np.copy(self.state)
-            state[state > 0] = 1
-            implot = ax.imshow(state, cmap=cmap, interpolation='nearest')
-            # Shift grid to be at 0.5, 1.5, etc
-            locs = np.arange(state.shape[0])
-            for axis in [ax.xaxis, ax.yaxis]:
-                axis.set_ticks(locs + 0.5, minor=True)
-                axis.set(ticks=[], ticklabels=[])
-            ax.grid(True, which='minor')
-        else:
-            for t in texts:
-                t.remove()
-            texts.clear()
-        for i in range(self.width):
-            for j in range(self.width):
-                c = self.state.T[i, j]
-                texts.append(ax.text(i, j, str(c), va='center', ha='center', size=20))
-
-        plt.draw()
-        plt.pause(1e-3)
+        if not interactive or renderer is None or len(renderer.texts) != self.state.size:
+            renderer = PuzzleRenderer(self.state, plt.figure())
+            plt.show(block=False)
+        # the artists are updated in place, the grid is restored from the cached background
+        renderer.draw(self.state)
 
     def __create_board(self, width, inputs=None):
         """
@@ -91,12 +83,10 @@ class Board(object):
         :param inputs: number of input values
         """
         if inputs is None:
-            self.state = np.arange(1, width ** 2 + 1, dtype=np.uint8).reshape((width, width))
-            self.state.flat[-1] = 0  # last field is 0 = empty
-            # shuffle the board while not solvable
-
-            while not self.solvable() or self.solved():
-                np.random.shuffle(self.state.flat)
+            # uniformly random solvable board, only the (very unlikely) solved board is drawn again
+            self.state = random_state(width).reshape((width, width))
+            while self.solved():
+                self.state = random_state(width).reshape((width, width))
 
         else:
             self.state = np.asarray(inputs).reshape((width, width))
@@ -117,27 +107,10 @@ class Board(object):
 
     def solvable(self):
         """
-        Check if the puzzle is solvable by counting the number of inversions
+        Check if the puzzle is solvable by counting the number of inversions (see puzzle_random.is_solvable)
         :return: True if solvable, False otherwise
         """
-
-        inversions = 0
-        s = self.state
-        for i, v in enumerate(s[np.nonzero(s)]):
-            j = i + 1
-            while j < s.size:
-                if s.flat[j] < v and s.flat[j] != 0:
-                    inversions += 1
-                j += 1
-        size = s.shape[0]
-        # grid width is odd and number of inversion even -> solvable
-        if size % 2 != 0 and inversions % 2 == 0:
-            return True
-        # grid width is even
-        if size % 2 == 0:
-            emptyrow = size - np.where(self.state == 0)[0][0]
-            return (emptyrow % 2 != 0) == (inversions % 2 == 0)
-        return False
+        return is_solvable(self.state)
 
     def move(self, direction):
         """
@@ -145,175 +118,70 @@ class Board(object):
         :param direction: direction as string out of ['up', 'down', 'left', 'right']
         :return: True if the move was successful, False otherwise
         """
-        
-        freifeld=self.searchnull()
-               
-        if(direction=='up'):
-            if freifeld[0]!=0:
-                value=self.state[freifeld[0]-1,freifeld[1]]
-                #Tauschen
-                self.state[freifeld[0],freifeld[1]]=value
-                self.state[freifeld[0]-1,freifeld[1]]=0
-                self.history.append(direction)
-                return True
-         
-        if(direction=='down'):
-            if freifeld[0]!=2:
-                value=self.state[freifeld[0]+1,freifeld[1]]
-                #Tauschen
-                self.state[freifeld[0],freifeld[1]]=value
-                self.state[freifeld[0]+1,freifeld[1]]=0
-                self.history.append(direction)
-                return True
-                
-        if(direction=='left'):
-            if freifeld[1]!=0:
-                value=self.state[freifeld[0],freifeld[1]-1]
-                #Tauschen
-                self.state[freifeld[0],freifeld[1]]=value
-                self.state[freifeld[0],freifeld[1]-1]=0
-                self.history.append(direction)
-                return True
-                
-        if(direction=='right'):
-            if freifeld[1]!=2:
-                value=self.state[freifeld[0],freifeld[1]+1]
-                #Tauschen
-                self.state[freifeld[0],freifeld[1]]=value
-                self.state[freifeld[0],freifeld[1]+1]=0
-                self.history.append(direction)
-                return True
-            
-        return False
-    
-    
-    def hashing(self,board):
-        zeile1=board.state[0]
-        zeile2=board.state[1]
-        zeile3=board.state[2]
-        
-        hashsum=zeile1[0]*100000000+zeile1[1]*10000000+zeile1[2]*1000000+zeile2[0]*100000+zeile2[1]*10000+zeile2[2]*1000+zeile3[0]*100+zeile3[1]*10+zeile3[2]
-
-        if hashsum in allstate:
+        if direction not in MOVES:
             return False
-        else:
-            allstate.append(hashsum)
+        cells = self.state.reshape(-1)
+        blank = int(np.argmax(cells == 0))
+        target = neighbor_table(self.width)[blank, MOVES.index(direction)]
+        if target < 0:
+            return False
+        apply_move(cells, blank, target)
+        self.history.append(direction)
         return True
-     
-    
+
+
+    def hashing(self, visited):
+        """
+        Marks the current state as visited
+        :param visited: puzzle_rank.VisitedSet shared by the search
+        :return: True if the state has not been visited before, False otherwise
+        """
+        return visited.add(encode(self.state))
+
+
     def searchnull(self):
-        pos=[]
-        width=3
-        for i in range(width):
-            for j in range(width):
-                if self.state[i,j]==0:
-                    pos=[i,j]
-        return pos             
+        """
+        Finds the empty field
+        :return: [row, column] of the empty field
+        """
+        return list(divmod(int(np.argmax(self.state.reshape(-1) == 0)), self.width))
 
 
-    def solver(self,allboards=[]):
-        print("Solver")
-   
-        vorgaenger=[]
-        vorgaenger=deepcopy(allboards)
-        allboards=[]
-            
-        if len(vorgaenger)==0:
-            a1=deepcopy(self)
-            a2=deepcopy(self)
-            a3=deepcopy(self)
-            a4=deepcopy(self)
-            
-            if a1.move('up')==True:
-                allboards.append(a1)
-                if a1.solved():
-                    print("finish")
-                    return True
-             
-            if a2.move('down')==True:
-                allboards.append(a2)
-                if a2.solved():
-                    print("finish")
-                    return True
-            
-            if a3.move('left')==True:
-                allboards.append(a3)
-                if a3.solved():
-                    print("finish")
-                    return True
-     
-            if a4.move('right')==True:
-                allboards.append(a4)
-                if a4.solved():
-                    print("finish")
-                    return True
-      
+    def solver(self, mode='astar', stats=None):
+        """
+        Solves the board and applies the found moves, so they end up in the history
+        :param mode: 'astar' for an iterative A* search (see puzzle_solver.astar), 'bidirectional' for a
+                     breadth first search from both ends (see puzzle_solver.bidirectional), 'table' to follow the
+                     precomputed distance table (see puzzle_table, only for small boards) or 'idastar' for IDA*
+                     with additive pattern databases (see puzzle_pdb, needed for the 15-puzzle)
+        :param stats: optional puzzle_stats.SearchStats that receives the counters of the search
+        :return: True if the board was solved, False otherwise
+        :raises ValueError: if the board is not solvable
+        """
+        if mode == 'astar':
+            moves = astar(self.state, stats=stats)
+        elif mode == 'bidirectional':
+            moves = bidirectional(self.state, stats=stats)
+        elif mode == 'table':
+            moves = solve_with_table(self.state, load_table(self.width), stats=stats)
+        elif mode == 'idastar':
+            moves = idastar(self.state, stats=stats)
         else:
-            length=len(vorgaenger)
-            print(len(vorgaenger))
-            while length!=0:
-                a1=deepcopy(vorgaenger[length-1])
-                a2=deepcopy(vorgaenger[length-1])
-                a3=deepcopy(vorgaenger[length-1])
-                a4=deepcopy(vorgaenger[length-1])
-                length=length-1
+            raise ValueError("unknown solver mode {0}".format(mode))
+        if moves is None:
+            return False
+        for direction in moves:
+            self.move(direction)
+        return self.solved()
+
 
-                if a1.move('up')==True:
-                    if a1.hashing(a1)==True:
-                        allboards.append(a1)
-                    if a1.solved():
-                        print("finish")
-                        print(a1.state)
-                        print(a1.history)
-                        return True
-             
-                if a2.move('down')==True:
-                    if a2.hashing(a2)==True:
-                        allboards.append(a2)
-                    if a2.solved():
-                        print("finish")
-                        print(a2.state)
-                        print(a2.history)
-                        return True
-            
-                if a3.move('left')==True:
-                    if a3.hashing(a3)==True:
-                        allboards.append(a3)
-                    if a3.solved():
-                        print("finish")
-                        print(a3.state)
-                        print(a3.history)
-                        return True
-     
-                if a4.move('right')==True:
-                    if a4.hashing(a4)==True:
-                        allboards.append(a4)                
-                    if a4.solved():
-                        print("finish")
-                        print(a4.state)
-                        print(a4.history)
-                        return True
-         
-        if self.solved():
-            print("finish")
-            return True
-        
-        self.solver(allboards)
-        
-        
 if __name__ == "__main__":
     # main "function"
     b = Board(3)
     # plot initial state
     b.plot_state()
 
-    global allstate
-    allstate=[] 
-    
     b.solver()
-    
-    if b.hashing(b)==True:
-        print("hier")
 
     print(b.history) 
-    plt.show(block=True)
\ No newline at end of file
+    _pyplot().show(block=True)
\ No newline at end of file
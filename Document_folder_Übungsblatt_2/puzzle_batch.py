@@ -0,0 +1,126 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+import numpy as np
+
+from puzzle_pdb import idastar, load_databases
+from puzzle_random import is_solvable
+from puzzle_solver import astar, bidirectional
+from puzzle_table import load_table, solve_with_table
+
+MODES = ('astar', 'bidirectional', 'table', 'idastar')
+
+# precomputed tables of the worker process, opened once by _init_worker()
+_shared = {}
+
+
+def serialize(board):
+    """
+    Converts a board into the flat byte state that is sent to the worker processes
+    :param board: Board instance or numpy array with the board values
+    :return: bytes with one field per byte in row major order
+    """
+    state = getattr(board, 'state', board)
+    return np.asarray(state, dtype=np.uint8).tobytes()
+
+
+def deserialize(data):
+    """
+    Inverse of serialize()
+    :param data: flat byte state
+    :return: 2D numpy array with the board values
+    """
+    width = int(round(len(data) ** 0.5))
+    return np.frombuffer(data, dtype=np.uint8).reshape((width, width))
+
+
+def _init_worker(mode, widths):
+    """
+    Opens the precomputed tables of the mode in a worker process. They are memory mapped read only, so all
+    workers share the pages of the files. Private helper, do not call from the outside
+    """
+    _shared.clear()
+    for width in widths:
+        if mode == 'table':
+            _shared[width] = load_table(width)
+        elif mode == 'idastar':
+            _shared[width] = load_databases(width)
+
+
+def _solve_chunk(mode, chunk):
+    """
+    Solves a chunk of serialized boards in a worker process. Private helper, do not call from the outside
+    :param mode: one of MODES
+    :param chunk: list of (index, flat byte state) pairs
+    :return: list of (index, moves) pairs
+    """
+    results = []
+    for index, data in chunk:
+        state = deserialize(data)
+        width = state.shape[0]
+        if mode == 'astar':
+            moves = astar(state)
+        elif mode == 'bidirectional':
+            moves = bidirectional(state)
+        elif mode == 'table':
+            moves = solve_with_table(state, _shared[width])
+        else:
+            moves = idastar(state, _shared[width])
+        results.append((index, moves))
+    return results
+
+
+def solve_many(boards, workers=None, mode='astar', chunksize=16):
+    """
+    Solves many boards in parallel with a process pool and yields the results as soon as they are finished,
+    so the order differs from the input order.
+    :param boards: iterable of Board instances or numpy arrays
+    :param workers: number of worker processes, defaults to the number of cores
+    :param mode: solver of the workers, see Board.solver()
+    :param chunksize: number of boards sent to a worker at once
+    :return: generator of (index of the board in boards, list of moves) pairs
+    :raises ValueError: before anything is solved if one of the boards is not solvable
+    """
+    if mode not in MODES:
+        raise ValueError("unknown solver mode {0}".format(mode))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    states = [serialize(b) for b in boards]
+    # a worker would search forever for an unsolvable board (idastar has no depth limit), so check them all first
+    for index, data in enumerate(states):
+        if not is_solvable(deserialize(data)):
+            raise ValueError("Board {0} is not solvable!".format(index))
+    widths = sorted(set(int(round(len(s) ** 0.5)) for s in states))
+
+    # build missing tables once here instead of in every worker
+    _init_worker(mode, widths)
+
+    chunks = ([(i, states[i]) for i in range(start, min(start + chunksize, len(states)))]
+              for start in range(0, len(states), chunksize))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(mode, widths)) as pool:
+        # only keep a few chunks per worker in flight, so huge inputs do not pile up in the queue
+        pending = set(pool.submit(_solve_chunk, mode, c) for c in islice(chunks, 4 * workers))
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for result in future.result():
+                        yield result
+                    for c in islice(chunks, 1):
+                        pending.add(pool.submit(_solve_chunk, mode, c))
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+if __name__ == "__main__":
+    import time
+    from puzzle_rank import num_states, unrank
+
+    rng = np.random.RandomState(0)
+    boards = [np.array(unrank(r, 3), dtype=np.uint8).reshape((3, 3)) for r in rng.randint(num_states(3), size=2000)]
+    for workers in (1, os.cpu_count() or 1):
+        start = time.time()
+        lengths = [len(moves) for _, moves in solve_many(boards, workers=workers)]
+        print(workers, "workers:", len(lengths), "boards in", round(time.time() - start, 2), "s")
@@ -0,0 +1,209 @@
+import argparse
+import cProfile
+import json
+import multiprocessing
+import os
+import resource
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from puzzle_moves import neighbor_table
+from puzzle_pdb import idastar, load_databases
+from puzzle_rank import unrank
+from puzzle_solver import astar, bidirectional
+from puzzle_stats import SearchStats
+from puzzle_table import load_table, solve_with_table
+
+# optimal solution lengths of the 3x3 corpus
+DEPTHS_3 = (8, 14, 20, 24, 28, 31)
+
+# scramble lengths of the 4x4 corpus, the boards are grouped by their optimal depth afterwards
+WALKS_4 = (10, 20, 30, 40, 60)
+
+MODES = {3: ('astar', 'bidirectional', 'table', 'idastar'), 4: ('astar', 'bidirectional', 'idastar')}
+
+# the uninformed and the memory hungry searches are skipped on deeper 4x4 boards
+MAX_DEPTH = {(4, 'astar'): 40, (4, 'bidirectional'): 20}
+
+
+def corpus(seed=0, boards=5, widths=(3, 4)):
+    """
+    Fixed set of benchmark boards. The same seed always gives the same boards, each width has its own random
+    generator, so the boards of a width do not depend on the other widths.
+    :param seed: seed of the random generator
+    :param boards: number of boards per group
+    :param widths: board widths to create boards for, the tables of the other widths are not loaded (or built)
+    :return: list of (width, optimal depth, flat list of board values)
+    """
+    result = []
+
+    if 3 in widths:
+        rng = np.random.RandomState([seed, 3])
+        table = load_table(3)
+        for depth in DEPTHS_3:
+            ranks = np.flatnonzero(table == depth)
+            for r in rng.choice(ranks, size=min(boards, len(ranks)), replace=False):
+                result.append((3, depth, unrank(int(r), 3)))
+
+    if 4 in widths:
+        # random walks without immediate back moves, the optimal depth comes from IDA*
+        rng = np.random.RandomState([seed, 4])
+        neighbors = neighbor_table(4)
+        databases = load_databases(4)
+        for length in WALKS_4:
+            for _ in range(boards):
+                cells = list(range(1, 16)) + [0]
+                blank, previous = 15, None
+                for _ in range(length):
+                    targets = [t for t in neighbors[blank] if t >= 0 and t != previous]
+                    target = int(targets[rng.randint(len(targets))])
+                    cells[blank], cells[target] = cells[target], 0
+                    blank, previous = target, blank
+                result.append((4, len(idastar(cells, databases)), cells))
+    return result
+
+
+def _solve_all(width, mode, boards, profile=None, trace=False):
+    """
+    Solves boards in a fresh process so peak RSS and allocations belong to this mode only.
+    Private helper, do not call from the outside
+    :param width: width of the boards
+    :param mode: one of MODES[width]
+    :param boards: list of (optimal depth, flat board values)
+    :param profile: file for cProfile statistics or None
+    :param trace: True to measure the peak of the Python allocations with tracemalloc
+    :return: dict with the results per depth and the memory measurements of the process
+    """
+    shared = None
+    if mode == 'table':
+        shared = load_table(width)
+    elif mode == 'idastar':
+        shared = load_databases(width)
+
+    if trace:
+        tracemalloc.start()
+    profiler = cProfile.Profile() if profile else None
+    if profiler:
+        profiler.enable()
+
+    groups = {}
+    for depth, cells in boards:
+        stats = groups.setdefault(depth, (SearchStats(), [0.0]))
+        state = np.array(cells, dtype=np.uint8).reshape((width, width))
+        start = time.perf_counter()
+        if mode == 'astar':
+            moves = astar(state, stats=stats[0])
+        elif mode == 'bidirectional':
+            moves = bidirectional(state, stats=stats[0])
+        elif mode == 'table':
+            moves = solve_with_table(state, shared, stats=stats[0])
+        else:
+            moves = idastar(state, shared, stats=stats[0])
+        stats[1][0] += time.perf_counter() - start
+        if len(moves) != depth:
+            raise ValueError("{0} found {1} moves instead of {2}".format(mode, len(moves), depth))
+
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(profile)
+    result = {
+        'groups': {depth: dict(stats.as_dict(), seconds=seconds[0]) for depth, (stats, seconds) in groups.items()},
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    if trace:
+        result['tracemalloc_peak_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+    return result
+
+
+def run(seed=0, boards=5, widths=(3, 4), modes=None, profile_folder=None, trace=False):
+    """
+    Runs every solver mode on the corpus
+    :param seed: seed of the corpus
+    :param boards: number of boards per group of the corpus
+    :param widths: board widths to benchmark
+    :param modes: solver modes to benchmark, all of MODES if None
+    :param profile_folder: folder for one cProfile file per width and mode, no profiling if None
+    :param trace: True to measure the peak of the Python allocations with tracemalloc
+    :return: dict that can be stored as JSON
+    """
+    boards = corpus(seed, boards, widths)
+    report = {'seed': seed, 'results': []}
+    context = multiprocessing.get_context('spawn')
+    for width in widths:
+        for mode in MODES[width]:
+            if modes is not None and mode not in modes:
+                continue
+            limit = MAX_DEPTH.get((width, mode))
+            todo = [(d, c) for w, d, c in boards if w == width and (limit is None or d <= limit)]
+            profile = None
+            if profile_folder:
+                if not os.path.isdir(profile_folder):
+                    os.makedirs(profile_folder)
+                profile = os.path.join(profile_folder, '{0}_{1}.prof'.format(mode, width))
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                result = pool.submit(_solve_all, width, mode, todo, profile, trace).result()
+            for depth in sorted(result['groups']):
+                group = result['groups'][depth]
+                entry = dict(group, width=width, mode=mode, depth=depth,
+                             nodes_per_sec=group['expanded'] / group['seconds'] if group['seconds'] else 0.0,
+                             peak_rss_kb=result['peak_rss_kb'])
+                if trace:
+                    entry['tracemalloc_peak_kb'] = result['tracemalloc_peak_kb']
+                report['results'].append(entry)
+    return report
+
+
+def compare(report, baseline):
+    """
+    Prints the time and the expanded nodes per board of every group relative to an earlier run
+    :param report: result of run()
+    :param baseline: result of an earlier run(), e.g. loaded from its JSON file
+    """
+    old = {(r['width'], r['mode'], r['depth']): r for r in baseline['results']}
+    for r in report['results']:
+        before = old.get((r['width'], r['mode'], r['depth']))
+        if before is None or not before['seconds'] or not before['expanded']:
+            continue
+        time_ratio = (r['seconds'] / r['runs']) / (before['seconds'] / before['runs'])
+        expanded_ratio = (r['expanded'] / float(r['runs'])) / (before['expanded'] / float(before['runs']))
+        print("{0}x{0} {1:>13} depth {2:>2}: {3:6.2f}x time, {4:6.2f}x expanded".format(
+            r['width'], r['mode'], r['depth'], time_ratio, expanded_ratio))
+
+
+def print_report(report):
+    """
+    Prints the results of run() as a table
+    :param report: result of run()
+    """
+    print("{0:>5} {1:>13} {2:>5} {3:>5} {4:>10} {5:>10} {6:>12} {7:>10} {8:>10}".format(
+        'width', 'mode', 'depth', 'runs', 'seconds', 'expanded', 'nodes/sec', 'frontier', 'rss kB'))
+    for r in report['results']:
+        print("{0:>5} {1:>13} {2:>5} {3:>5} {4:>10.4f} {5:>10} {6:>12.0f} {7:>10} {8:>10}".format(
+            r['width'], r['mode'], r['depth'], r['runs'], r['seconds'], r['expanded'], r['nodes_per_sec'],
+            r['peak_frontier'], r['peak_rss_kb']))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of the sliding puzzle solvers")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the board corpus")
+    parser.add_argument('--boards', type=int, default=5, help="boards per depth group")
+    parser.add_argument('--widths', type=int, nargs='+', default=[3, 4], choices=sorted(MODES))
+    parser.add_argument('--modes', nargs='+', default=None, help="solver modes, all if omitted")
+    parser.add_argument('--profile', default=None, help="folder for cProfile output per mode")
+    parser.add_argument('--tracemalloc', action='store_true', help="measure peak Python allocations")
+    parser.add_argument('--json', default=None, help="write the results to this file")
+    parser.add_argument('--compare', default=None, help="JSON file of an earlier run to compare with")
+    args = parser.parse_args()
+
+    report = run(args.seed, args.boards, tuple(args.widths), args.modes, args.profile, args.tracemalloc)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
@@ -0,0 +1,62 @@
+from functools import lru_cache
+
+import numpy as np
+
+# directions the empty field can move in, same naming as Board.move()
+MOVES = ('up', 'down', 'left', 'right')
+
+
+@lru_cache(maxsize=None)
+def neighbor_table(width):
+    """
+    Target field for every position of the empty field and every direction
+    :param width: width of the square board
+    :return: read only int64 array of shape (width**2, 4), column m belongs to MOVES[m] and holds the index the
+             empty field moves to or -1 if the move leaves the board
+    """
+    index = np.arange(width * width).reshape((width, width))
+    table = np.full((width, width, 4), -1, dtype=np.int64)
+    table[1:, :, 0] = index[:-1, :]
+    table[:-1, :, 1] = index[1:, :]
+    table[:, 1:, 2] = index[:, :-1]
+    table[:, :-1, 3] = index[:, 1:]
+    table = table.reshape((width * width, 4))
+    table.flags.writeable = False
+    return table
+
+
+def apply_move(cells, blank, target):
+    """
+    Moves the tile at target into the empty field, in place
+    :param cells: flat state buffer (numpy array, list or bytearray)
+    :param blank: index of the empty field
+    :param target: index of the field the empty field moves to, from neighbor_table()
+    :return: the new index of the empty field (target)
+    """
+    cells[blank] = cells[target]
+    cells[target] = 0
+    return target
+
+
+def successors(states):
+    """
+    All successor states of a batch of states, without any Python loop over the boards or fields
+    :param states: array of shape (N, width**2) with flat board states
+    :return: tuple (children, parents, moves) where children has shape (M, width**2), parents holds the row of
+             the state every child was created from and moves the index into MOVES that created it
+    """
+    states = np.asarray(states)
+    width = int(round(states.shape[1] ** 0.5))
+    table = neighbor_table(width)
+    blanks = np.argmax(states == 0, axis=1)
+
+    targets = table[blanks]
+    parents, moves = np.nonzero(targets >= 0)
+    targets = targets[parents, moves]
+    blanks = blanks[parents]
+
+    rows = np.arange(len(parents))
+    children = states[parents]
+    children[rows, blanks] = children[rows, targets]
+    children[rows, targets] = 0
+    return children, parents, moves
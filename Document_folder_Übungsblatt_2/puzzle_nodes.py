@@ -0,0 +1,138 @@
+from array import array
+
+from puzzle_moves import neighbor_table
+from puzzle_state import cell_bits
+
+# multiplier of the Fibonacci hashing used by the index
+_GOLDEN = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+
+
+class NodePool(object):
+    """
+    Array backed storage of search nodes. A node is just an index into parallel arrays holding the packed state,
+    the index of the parent node and its cost, so a node needs 13 bytes (14 from width 5) instead of a Python
+    object per node. The move that created a node is not stored, it follows from the positions of the empty field
+    in the node and its parent. An open addressing hash index (array of node indices) finds the node of a packed
+    state. Paths are only reconstructed at the end by following the parent indices.
+    """
+    def __init__(self, width, capacity=1 << 10, indexed=True):
+        """
+        Constructor.
+        :param width: width of the boards whose states are stored
+        :param capacity: initial number of slots of the index, must be a power of 2
+        :param indexed: keep the hash index, without it find() is not available and a state may be added twice.
+                        For searches that track the visited states elsewhere, e.g. in a puzzle_rank.VisitedSet
+        """
+        self.width = width
+        self.indexed = indexed
+        # packed states of larger boards do not fit into 64 bits
+        self.states = array('Q') if cell_bits(width) * width * width <= 64 else []
+        self.parents = array('i')
+        # no state of the 15-puzzle is more than 80 moves from any other, larger boards need 2 bytes
+        self.costs = array('B') if width <= 4 else array('H')
+        self._index = array('i', [-1]) * capacity if indexed else None
+        self._shift = 64 - (capacity.bit_length() - 1)
+
+    def __len__(self):
+        return len(self.parents)
+
+    def find(self, code):
+        """
+        Looks up the node of a packed state
+        :param code: the packed state
+        :return: index of the node, -1 if the state has not been added
+        """
+        index = self._index
+        states = self.states
+        mask = len(index) - 1
+        slot = ((code * _GOLDEN) & _MASK64) >> self._shift
+        node = index[slot]
+        while node >= 0 and states[node] != code:
+            slot = (slot + 1) & mask
+            node = index[slot]
+        return node
+
+    def add(self, code, parent, cost):
+        """
+        Adds a new node. In an indexed pool the state must not have been added before (see find())
+        :param code: the packed state
+        :param parent: index of the parent node, -1 for the root
+        :param cost: number of moves from the root
+        :return: index of the new node
+        """
+        node = len(self.parents)
+        self.states.append(code)
+        self.parents.append(parent)
+        self.costs.append(cost)
+        if not self.indexed:
+            return node
+
+        # keep the index at most 3/4 full
+        if 4 * (node + 1) > 3 * len(self._index):
+            self._grow()
+            return node
+        index = self._index
+        mask = len(index) - 1
+        slot = ((code * _GOLDEN) & _MASK64) >> self._shift
+        while index[slot] >= 0:
+            slot = (slot + 1) & mask
+        index[slot] = node
+        return node
+
+    def update(self, node, parent, cost):
+        """
+        Stores a cheaper way to reach an existing node
+        :param node: index of the node
+        :param parent: index of the new parent node
+        :param cost: new number of moves from the root
+        """
+        self.parents[node] = parent
+        self.costs[node] = cost
+
+    def path(self, node):
+        """
+        Reconstructs the moves from the root to a node
+        :param node: index of the node
+        :return: list of move indices (see puzzle_moves.MOVES)
+        """
+        table = neighbor_table(self.width)
+        moves = []
+        blank = self._blank(node)
+        while self.parents[node] >= 0:
+            node = self.parents[node]
+            parent_blank = self._blank(node)
+            moves.append(list(table[parent_blank]).index(blank))
+            blank = parent_blank
+        moves.reverse()
+        return moves
+
+    def _blank(self, node):
+        """
+        Position of the empty field of a node. Private helper, do not call from the outside
+        """
+        code = self.states[node]
+        bits = cell_bits(self.width)
+        mask = (1 << bits) - 1
+        for i in range(self.width * self.width):
+            if (code >> (i * bits)) & mask == 0:
+                return i
+        return -1
+
+    def _grow(self):
+        """
+        Doubles the index and inserts all nodes again. Private helper, do not call from the outside
+        """
+        capacity = 2 * len(self._index)
+        # the old slots are not needed for the rebuild, release them before allocating the new ones
+        self._index = None
+        index = array('i', [-1]) * capacity
+        mask = capacity - 1
+        shift = self._shift - 1
+        for node, code in enumerate(self.states):
+            slot = ((code * _GOLDEN) & _MASK64) >> shift
+            while index[slot] >= 0:
+                slot = (slot + 1) & mask
+            index[slot] = node
+        self._index = index
+        self._shift = shift
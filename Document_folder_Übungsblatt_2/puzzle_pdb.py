@@ -0,0 +1,283 @@
+import os
+
+import numpy as np
+
+from puzzle_moves import MOVES, neighbor_table
+from puzzle_random import is_solvable
+from puzzle_solver import move_tables
+from puzzle_table import DATA_FOLDER, UNKNOWN
+
+# disjoint tile groups per width, the 6-6-3 partitioning for the 15-puzzle
+DEFAULT_PATTERNS = {
+    3: ((1, 2, 3, 4), (5, 6, 7, 8)),
+    4: ((1, 5, 6, 9, 10, 13), (7, 8, 11, 12, 14, 15), (2, 3, 4)),
+}
+
+# largest number of entries a generated default database may have
+MAX_ENTRIES = 1 << 23
+
+# number of states expanded at once while building a database, keeps the temporary arrays small
+CHUNK = 1 << 21
+
+
+def placements(n, k):
+    """
+    Number of ways to place k distinguishable tiles on n fields
+    :param n: number of fields
+    :param k: number of tiles
+    :return: n! / (n - k)!
+    """
+    count = 1
+    for i in range(k):
+        count *= n - i
+    return count
+
+
+def default_patterns(width):
+    """
+    Disjoint partitioning of all tiles into patterns for the given width. Uses DEFAULT_PATTERNS if available and
+    otherwise splits the tiles in row major order into the largest groups that fit into MAX_ENTRIES.
+    :param width: width of the square board
+    :return: tuple of tile tuples
+    """
+    if width in DEFAULT_PATTERNS:
+        return DEFAULT_PATTERNS[width]
+    n = width * width
+    k = 1
+    while k < n - 1 and placements(n, k + 1) <= MAX_ENTRIES:
+        k += 1
+    tiles = list(range(1, n))
+    return tuple(tuple(tiles[i:i + k]) for i in range(0, len(tiles), k))
+
+
+def placement_index(positions, n):
+    """
+    Perfect index of the fields occupied by the tiles of a pattern
+    :param positions: field index of every pattern tile, in pattern order
+    :param n: number of fields of the board
+    :return: index in [0, placements(n, len(positions)))
+    """
+    index = 0
+    for i, p in enumerate(positions):
+        smaller = 0
+        for q in positions[:i]:
+            if q < p:
+                smaller += 1
+        index = index * (n - i) + p - smaller
+    return index
+
+
+def _placement_indices(positions, n):
+    """
+    Vectorized placement_index() for an (N, k) array of positions. Private helper, do not call from the outside
+    """
+    positions = positions.astype(np.int64)
+    index = np.zeros(len(positions), dtype=np.int64)
+    for i in range(positions.shape[1]):
+        p = positions[:, i]
+        smaller = (positions[:, :i] < p[:, None]).sum(axis=1)
+        index = index * (n - i) + p - smaller
+    return index
+
+
+def build_pattern_database(width, tiles):
+    """
+    Builds the pattern database for one group of tiles with a vectorized breadth first search from the goal.
+    Only moves of pattern tiles are counted, moves of other tiles are free. This keeps the databases of a disjoint
+    partitioning additive. States are (placement of the pattern tiles, position of the empty field), the stored
+    value is the minimum over all positions of the empty field.
+    :param width: width of the square board
+    :param tiles: tile numbers of the pattern
+    :return: uint8 numpy array indexed by placement_index()
+    """
+    n = width * width
+    k = len(tiles)
+    neighbors = neighbor_table(width)
+
+    table = np.full(placements(n, k), UNKNOWN, dtype=np.uint8)
+    seen = np.zeros(placements(n, k) * n, dtype=bool)
+
+    def unseen(positions, blanks):
+        # drops duplicates and states visited before, marks the rest as visited
+        keys = _placement_indices(positions, n) * n + blanks
+        keys, first = np.unique(keys, return_index=True)
+        new = ~seen[keys]
+        seen[keys[new]] = True
+        first = first[new]
+        return positions[first], blanks[first]
+
+    positions = np.array([[t - 1 for t in tiles]], dtype=np.int8)
+    blanks = np.array([n - 1], dtype=np.int64)
+    positions, blanks = unseen(positions, blanks)
+    depth = 0
+    while len(positions):
+        if depth >= UNKNOWN:
+            raise ValueError("distances do not fit into the table")
+
+        # all states reachable by moving only other tiles have the same cost
+        layer_positions, layer_blanks = [positions], [blanks]
+        while len(positions):
+            new_positions, new_blanks = [], []
+            for start in range(0, len(positions), CHUNK):
+                p, b = positions[start:start + CHUNK], blanks[start:start + CHUNK]
+                for m in range(4):
+                    target = neighbors[b, m]
+                    free = (target >= 0) & ~(p == target[:, None]).any(axis=1)
+                    new_positions.append(p[free])
+                    new_blanks.append(target[free])
+            positions, blanks = unseen(np.concatenate(new_positions), np.concatenate(new_blanks))
+            layer_positions.append(positions)
+            layer_blanks.append(blanks)
+        positions = np.concatenate(layer_positions)
+        blanks = np.concatenate(layer_blanks)
+
+        index = _placement_indices(positions, n)
+        table[index[table[index] == UNKNOWN]] = depth
+
+        # moving a pattern tile costs one move
+        new_positions, new_blanks = [], []
+        for start in range(0, len(positions), CHUNK):
+            p, b = positions[start:start + CHUNK], blanks[start:start + CHUNK]
+            for m in range(4):
+                target = neighbors[b, m]
+                rows, slots = np.nonzero((p == target[:, None]) & (target >= 0)[:, None])
+                moved = p[rows]
+                moved[np.arange(len(rows)), slots] = b[rows]
+                new_positions.append(moved)
+                new_blanks.append(target[rows])
+        positions, blanks = unseen(np.concatenate(new_positions), np.concatenate(new_blanks))
+        depth += 1
+    return table
+
+
+def pattern_path(width, tiles, folder=DATA_FOLDER):
+    """
+    Default file name of a pattern database
+    :param width: width of the square board
+    :param tiles: tile numbers of the pattern
+    :param folder: folder the database is stored in
+    :return: path of the .npy file
+    """
+    return os.path.join(folder, 'pdb{0}_{1}.npy'.format(width, '-'.join(str(t) for t in tiles)))
+
+
+def load_databases(width, patterns=None, folder=DATA_FOLDER):
+    """
+    Opens the pattern databases of a partitioning as read only memory maps. Missing databases are built and
+    saved first, so only the very first call pays for the generation.
+    :param width: width of the square board
+    :param patterns: disjoint tile groups, defaults to default_patterns(width)
+    :param folder: folder the databases are stored in
+    :return: list of (tiles, memmap) pairs
+    """
+    if patterns is None:
+        patterns = default_patterns(width)
+    databases = []
+    for tiles in patterns:
+        path = pattern_path(width, tiles, folder)
+        if not os.path.exists(path):
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            np.save(path, build_pattern_database(width, tiles))
+        table = np.load(path, mmap_mode='r')
+        if table.shape != (placements(width * width, len(tiles)),):
+            raise ValueError("{0} is not a pattern database for width {1}".format(path, width))
+        databases.append((tuple(tiles), table))
+    return databases
+
+
+def idastar(state, databases=None, stats=None):
+    """
+    Iterative deepening A* with the additive pattern database heuristic. Works for every width, the memory
+    needed besides the databases is linear in the solution length.
+    :param state: 2D numpy array with the board values, 0 is the empty field
+    :param databases: result of load_databases(), loaded for the width of the board if None
+    :param stats: optional puzzle_stats.SearchStats that receives the counters of the search, the frontier of
+                  IDA* is the deepest path it followed
+    :return: list of moves (see puzzle_solver.MOVES) that solves the board
+    :raises ValueError: if the board is not solvable, the thresholds would grow forever
+    """
+    if not is_solvable(state):
+        raise ValueError("Board is not solvable!")
+    cells = [int(v) for v in np.asarray(state).ravel()]
+    n = len(cells)
+    width = int(round(n ** 0.5))
+    if databases is None:
+        databases = load_databases(width)
+    neighbors = move_tables(width)[0]
+
+    # pattern number and slot inside the pattern for every tile
+    owner = [None] * n
+    positions = []
+    tables = []
+    for p, (tiles, table) in enumerate(databases):
+        for slot, t in enumerate(tiles):
+            owner[t] = (p, slot)
+        positions.append([cells.index(t) for t in tiles])
+        # plain integer lookups on the mapped buffer are much faster than numpy indexing
+        tables.append(memoryview(table))
+    if any(o is None for o in owner[1:]):
+        raise ValueError("the patterns do not cover all tiles")
+    indices = [placement_index(pos, n) for pos in positions]
+    h = sum(table[i] for table, i in zip(tables, indices))
+
+    path = []
+    found = -1
+    # expanded, generated, deepest path
+    counters = [0, 0, 0]
+
+    def search(g, h, blank, previous, bound):
+        f = g + h
+        if f > bound:
+            return f
+        if h == 0:
+            # all tiles are at their goal, so the empty field is as well
+            return found
+        counters[0] += 1
+        if g >= counters[2]:
+            counters[2] = g + 1
+        minimum = float('inf')
+        for m, target in neighbors[blank]:
+            if target == previous:
+                continue
+            tile = cells[target]
+            p, slot = owner[tile]
+            pos = positions[p]
+            old_index = indices[p]
+            pos[slot] = blank
+            new_index = placement_index(pos, n)
+            table = tables[p]
+            child_h = h - table[old_index] + table[new_index]
+
+            indices[p] = new_index
+            cells[blank], cells[target] = tile, 0
+            path.append(m)
+            counters[1] += 1
+            t = search(g + 1, child_h, target, blank, bound)
+            if t == found:
+                return found
+            path.pop()
+            cells[blank], cells[target] = 0, tile
+            indices[p] = old_index
+            pos[slot] = target
+
+            if t < minimum:
+                minimum = t
+        return minimum
+
+    bound = h
+    blank = cells.index(0)
+    while True:
+        t = search(0, h, blank, None, bound)
+        if t == found:
+            if stats is not None:
+                stats.record(*counters)
+            return [MOVES[m] for m in path]
+        bound = t
+
+
+if __name__ == "__main__":
+    # generate the default databases once, later calls of load_databases() just map the files
+    for width in sorted(DEFAULT_PATTERNS):
+        for tiles, table in load_databases(width):
+            print(width, tiles, table.shape, int(table.max()))
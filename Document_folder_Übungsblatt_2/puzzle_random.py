@@ -0,0 +1,100 @@
+import numpy as np
+
+from puzzle_rank import solvable_parity
+
+
+def count_inversions(values):
+    """
+    Counts the pairs i < j with values[i] > values[j] using a Fenwick tree, O(n log n)
+    :param values: sequence of distinct integers in [0, len(values)] (the tiles of a board without the empty field)
+    :return: number of inversions
+    """
+    size = len(values) + 1
+    tree = [0] * (size + 1)
+    inversions = 0
+    for seen, v in enumerate(values):
+        # number of earlier values <= v
+        smaller = 0
+        i = v + 1
+        while i > 0:
+            smaller += tree[i]
+            i -= i & -i
+        inversions += seen - smaller
+        i = v + 1
+        while i <= size:
+            tree[i] += 1
+            i += i & -i
+    return inversions
+
+
+def is_solvable(state):
+    """
+    Check if a board state is solvable by counting the number of inversions, same rule as Board.solvable()
+    :param state: 2D numpy array (or flat sequence) with the board values, 0 is the empty field
+    :return: True if solvable, False otherwise
+    """
+    cells = [int(v) for v in np.asarray(state).ravel()]
+    width = int(round(len(cells) ** 0.5))
+    inversions = count_inversions([v for v in cells if v])
+    return inversions % 2 == solvable_parity(width, cells.index(0))
+
+
+def _fix_parity(cells, blanks, wrong):
+    """
+    Swaps two tiles in the rows of cells that have the wrong parity. A swap of two tiles changes the number of
+    inversions by an odd number and keeps the empty field in place, so it turns an unsolvable board into a
+    solvable one. Since this is a bijection between both halves, uniform boards stay uniform.
+    Private helper, do not call from the outside
+    :param cells: (N, width**2) array, changed in place
+    :param blanks: index of the empty field per row
+    :param wrong: bool mask of the rows to fix
+    """
+    rows = np.nonzero(wrong)[0]
+    # the first two of the fields 0, 1, 2 that are not empty
+    a = np.where(blanks[rows] == 0, 1, 0)
+    b = np.where(blanks[rows] <= 1, 2, 1)
+    first = cells[rows, a]
+    cells[rows, a] = cells[rows, b]
+    cells[rows, b] = first
+
+
+def random_state(width, rng=np.random):
+    """
+    Creates a uniformly random solvable board without rejection sampling
+    :param width: width of the square board
+    :param rng: numpy random generator or np.random (default, so np.random.seed() applies)
+    :return: flat uint8 array with the board values, 0 is the empty field
+    """
+    cells = rng.permutation(width * width).astype(np.uint8)
+    if not is_solvable(cells):
+        # same parity fix as _fix_parity(): swap the first two tiles
+        a, b = [i for i in range(3) if cells[i]][:2]
+        cells[a], cells[b] = cells[b], cells[a]
+    return cells
+
+
+def random_boards(n, width, rng=np.random):
+    """
+    Creates many uniformly random solvable boards at once
+    :param n: number of boards
+    :param width: width of the square boards
+    :param rng: numpy random generator or np.random (default, so np.random.seed() applies)
+    :return: uint8 array of shape (n, width**2) with one flat board state per row
+    """
+    size = width * width
+    cells = np.argsort(rng.random((n, size)), axis=1).astype(np.uint8)
+    blanks = np.argmax(cells == 0, axis=1)
+
+    # parity of the tile inversions, the empty field does not count
+    parity = np.zeros(n, dtype=np.uint8)
+    for i in range(size - 1):
+        a = cells[:, i:i + 1]
+        parity ^= (((a > cells[:, i + 1:]) & (cells[:, i + 1:] != 0)).sum(axis=1) & 1).astype(np.uint8)
+
+    if width % 2 != 0:
+        required = np.zeros(n, dtype=np.uint8)
+    else:
+        emptyrow = width - blanks // width
+        required = (emptyrow % 2 == 0).astype(np.uint8)
+    _fix_parity(cells, blanks, parity != required)
+    return cells
@@ -0,0 +1,175 @@
+from functools import lru_cache
+from math import factorial
+
+from puzzle_state import cell_bits
+
+# boards up to this width get a dense visited vector, larger ones have too many states for that
+DENSE_MAX_WIDTH = 3
+
+
+def num_states(width):
+    """
+    Number of solvable states of a board with the given width (half of all permutations)
+    :param width: width of the square board
+    :return: number of solvable states
+    """
+    return factorial(width * width) // 2
+
+
+def solvable_parity(width, blank):
+    """
+    Parity of the tile inversions a solvable board must have for the given empty field.
+    Same rule as Board.solvable()
+    :param width: width of the square board
+    :param blank: index of the empty field
+    :return: 0 if the number of inversions must be even, 1 if it must be odd
+    """
+    if width % 2 != 0:
+        return 0
+    emptyrow = width - blank // width
+    return 0 if emptyrow % 2 != 0 else 1
+
+
+def rank(cells):
+    """
+    Perfect rank of a solvable board state in [0, num_states(width)).
+    The rank combines the position of the empty field with the Lehmer code of the tile order. Two permutations
+    whose Lehmer ranks only differ in the last bit have a different parity, so halving the Lehmer rank
+    is a bijection on the solvable half.
+    :param cells: flat sequence with the board values, 0 is the empty field
+    :return: the rank
+    """
+    m = len(cells) - 1
+    blank = 0
+    # bit t is set once tile t has been seen
+    seen = 0
+    lehmer = 0
+    k = 0
+    for i, t in enumerate(cells):
+        if not t:
+            blank = i
+            continue
+        # the smaller tiles that are not left of t are right of it
+        lehmer = lehmer * (m - k) + t - 1 - bin(seen & ((1 << t) - 1)).count("1")
+        seen |= 1 << t
+        k += 1
+    return blank * (factorial(m) // 2) + lehmer // 2
+
+
+def unrank(r, width):
+    """
+    Inverse of rank()
+    :param r: rank of a solvable state
+    :param width: width of the square board
+    :return: list with the board values
+    """
+    n = width * width
+    m = n - 1
+    half = factorial(m) // 2
+    blank, lehmer = divmod(r, half)
+    lehmer *= 2
+
+    digits = []
+    for base in range(1, m + 1):
+        lehmer, d = divmod(lehmer, base)
+        digits.append(d)
+    digits.reverse()
+    if sum(digits) % 2 != solvable_parity(width, blank):
+        # the partner permutation (last two tiles swapped) has the required parity
+        digits[-2] ^= 1
+
+    available = list(range(1, n))
+    cells = [available.pop(d) for d in digits]
+    cells.insert(blank, 0)
+    return cells
+
+
+def rank_code(code, width):
+    """
+    Rank of a state packed with puzzle_state.encode(), same result as rank() without unpacking the state first
+    :param code: the packed state
+    :param width: width of the square board
+    :return: the rank
+    """
+    bits = cell_bits(width)
+    mask = (1 << bits) - 1
+    m = width * width - 1
+    ones = _ones(m)
+    blank = 0
+    seen = 0
+    lehmer = 0
+    k = 0
+    for i in range(m + 1):
+        t = code & mask
+        code >>= bits
+        if not t:
+            blank = i
+            continue
+        lehmer = lehmer * (m - k) + t - 1 - ones[seen & ((1 << t) - 1)]
+        seen |= 1 << t
+        k += 1
+    return blank * (factorial(m) // 2) + lehmer // 2
+
+
+@lru_cache(maxsize=None)
+def _ones(m):
+    """
+    Number of set bits of every mask of tiles 1 to m (bit t is tile t). Private helper, do not call from the outside
+    """
+    return bytes(bin(v).count("1") for v in range(1 << (m + 1)))
+
+
+class VisitedSet(object):
+    """
+    Closed set for searches over board states of one width. States are given as packed integers
+    (see puzzle_state.encode()). For small boards the set is a preallocated numpy bool vector indexed by the
+    rank of the state (181440 bytes for the 3x3 board), larger boards fall back to a set of the packed integers.
+    The vector is a bytearray, reading single entries of it is several times faster than of a numpy array.
+    """
+    def __init__(self, width):
+        """
+        Constructor.
+        :param width: width of the boards whose states are stored
+        """
+        self.width = width
+        self.count = 0
+        if width <= DENSE_MAX_WIDTH:
+            self.seen = bytearray(num_states(width))
+        else:
+            self.seen = set()
+
+    def add(self, code):
+        """
+        Marks a state as visited
+        :param code: the packed state
+        :return: True if the state was not visited before, False otherwise
+        """
+        if isinstance(self.seen, set):
+            if code in self.seen:
+                return False
+            self.seen.add(code)
+        else:
+            r = rank_code(code, self.width)
+            if self.seen[r]:
+                return False
+            self.seen[r] = 1
+        self.count += 1
+        return True
+
+    def __contains__(self, code):
+        if isinstance(self.seen, set):
+            return code in self.seen
+        return self.seen[rank_code(code, self.width)] == 1
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        """
+        Forgets all visited states, but keeps the allocated memory
+        """
+        if isinstance(self.seen, set):
+            self.seen.clear()
+        else:
+            self.seen[:] = bytes(len(self.seen))
+        self.count = 0
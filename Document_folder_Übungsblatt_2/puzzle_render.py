@@ -0,0 +1,129 @@
+import argparse
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.figure import Figure
+
+from puzzle_moves import MOVES, apply_move, neighbor_table
+from render_animation import write_animation
+
+
+class PuzzleRenderer(object):
+    """
+    Draws board states with one image artist for the fields and one text artist per field that are created once
+    and only updated afterwards. The grid is drawn once, its pixels are cached, and every later frame only
+    restores them and draws the image and the texts again (blitting).
+    Without a figure the renderer draws offscreen on an Agg canvas, no GUI backend is needed.
+    """
+    def __init__(self, state, fig=None):
+        """
+        Constructor.
+        :param state: 2D numpy array with the board values, only the width is used
+        :param fig: matplotlib figure to draw into (e.g. plt.figure()), None to draw offscreen
+        """
+        if fig is None:
+            fig = Figure()
+            FigureCanvasAgg(fig)
+        self.fig = fig
+        self.ax = fig.add_subplot(111)
+        width = state.shape[0]
+
+        # same look as Board.plot_state(), the empty field is black
+        colors = [(0.0, 0.0, 0.0, 1.0), (1.0, 1.0, 1.0, 1.0)]
+        cmap = LinearSegmentedColormap.from_list('Custom cmap', colors, 2)
+        self.image = self.ax.imshow(np.ones((width, width)), cmap=cmap, interpolation='nearest', vmin=0, vmax=1,
+                                    animated=True)
+        locs = np.arange(width)
+        for axis in [self.ax.xaxis, self.ax.yaxis]:
+            axis.set_ticks(locs + 0.5, minor=True)
+            axis.set(ticks=[], ticklabels=[])
+        self.ax.grid(True, which='minor')
+        # the image covers the grid and the frame of the cached background, they are drawn again on top
+        self.overlay = [t.gridline for axis in [self.ax.xaxis, self.ax.yaxis] for t in axis.get_minor_ticks()]
+        self.overlay.extend(self.ax.spines.values())
+        self.texts = [self.ax.text(j, i, '', va='center', ha='center', size=20, animated=True)
+                      for i in range(width) for j in range(width)]
+
+        self.background = None
+        self.fig.canvas.mpl_connect('draw_event', self.__on_draw)
+
+    def __on_draw(self, event):
+        """
+        Private helper to cache the grid pixels after every full redraw (first frame, resizing).
+        Do not call from the outside.
+        """
+        self.background = self.fig.canvas.copy_from_bbox(self.ax.bbox)
+        self.__draw_artists()
+
+    def __draw_artists(self):
+        """
+        Private helper to draw the animated artists. Do not call from the outside.
+        """
+        self.ax.draw_artist(self.image)
+        for artist in self.overlay + self.texts:
+            self.ax.draw_artist(artist)
+
+    def draw(self, state):
+        """
+        Draws a board state
+        :param state: 2D numpy array with the board values, same width as in the constructor
+        """
+        self.image.set_data(state > 0)
+        for t, value in zip(self.texts, state.ravel()):
+            t.set_text(str(value))
+        canvas = self.fig.canvas
+        if self.background is None:
+            canvas.draw()
+        else:
+            canvas.restore_region(self.background)
+            self.__draw_artists()
+            canvas.blit(self.ax.bbox)
+        canvas.flush_events()
+
+    def frame(self, state):
+        """
+        Draws a board state and returns the pixels
+        :param state: 2D numpy array with the board values
+        :return: (height, width, 4) uint8 RGBA array
+        """
+        self.draw(state)
+        return np.array(self.fig.canvas.buffer_rgba())
+
+
+def render_solution(state, moves, path, fps=4):
+    """
+    Writes an animation of a move sequence offscreen
+    :param state: 2D numpy array with the start state, it is not changed
+    :param moves: list of directions out of puzzle_moves.MOVES (e.g. Board.history)
+    :param path: output file (.gif or e.g. .mp4)
+    :param fps: moves per second
+    """
+    renderer = PuzzleRenderer(state)
+    state = np.array(state)
+    cells = state.reshape(-1)
+    table = neighbor_table(state.shape[0])
+
+    def frames():
+        yield renderer.frame(state)
+        blank = int(np.argmax(cells == 0))
+        for direction in moves:
+            blank = apply_move(cells, blank, int(table[blank, MOVES.index(direction)]))
+            yield renderer.frame(state)
+
+    write_animation(frames(), path, fps)
+
+
+if __name__ == "__main__":
+    from puzzle_random import random_state
+    from puzzle_solver import astar
+
+    parser = argparse.ArgumentParser(description="Writes an animation of a sliding puzzle solution")
+    parser.add_argument('path', nargs='?', default='solution.gif', help="output file (.gif or e.g. .mp4)")
+    parser.add_argument('--width', type=int, default=3, help="width of the random board")
+    parser.add_argument('--fps', type=int, default=4, help="moves per second")
+    args = parser.parse_args()
+
+    start = random_state(args.width).reshape((args.width, args.width))
+    render_solution(start, astar(start), args.path, args.fps)
+    print("written", args.path)
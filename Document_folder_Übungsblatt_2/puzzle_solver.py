@@ -0,0 +1,274 @@
+from array import array
+from functools import lru_cache
+
+import numpy as np
+
+from puzzle_moves import MOVES, neighbor_table
+from puzzle_state import cell_bits, encode, goal_code
+from puzzle_nodes import NodePool
+from puzzle_random import is_solvable
+from puzzle_rank import DENSE_MAX_WIDTH, VisitedSet
+
+
+@lru_cache(maxsize=None)
+def move_tables(width):
+    """
+    Precomputed lookup tables for the given width
+    :param width: width of the square board
+    :return: tuple (neighbors, manhattan) where neighbors[i] lists (move, target index) pairs for the empty
+             field at index i and manhattan[t][i] is the distance of tile t at index i to its goal index
+    """
+    size = width * width
+    neighbors = tuple(tuple((m, int(t)) for m, t in enumerate(row) if t >= 0) for row in neighbor_table(width))
+
+    manhattan = [[0] * size]
+    for t in range(1, size):
+        gr, gc = divmod(t - 1, width)
+        manhattan.append([abs(i // width - gr) + abs(i % width - gc) for i in range(size)])
+    return neighbors, tuple(tuple(row) for row in manhattan)
+
+
+@lru_cache(maxsize=None)
+def _line_conflict(goals):
+    """
+    Linear conflict penalty of one row or column. Private helper, do not call from the outside
+    :param goals: goal positions (inside the line) of the tiles that belong to this line, in their current order
+    :return: 2 * number of tiles that have to leave the line to resolve all conflicts
+    """
+    # the tiles that can stay form the longest increasing subsequence of their goal positions
+    tails = []
+    for g in goals:
+        lo, hi = 0, len(tails)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if tails[mid] < g:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == len(tails):
+            tails.append(g)
+        else:
+            tails[lo] = g
+    return 2 * (len(goals) - len(tails))
+
+
+def _row_conflict(cells, width, row):
+    goals = tuple((t - 1) % width for t in cells[row * width:(row + 1) * width] if t and (t - 1) // width == row)
+    return _line_conflict(goals)
+
+
+def _col_conflict(cells, width, col):
+    goals = tuple((t - 1) // width for t in cells[col::width] if t and (t - 1) % width == col)
+    return _line_conflict(goals)
+
+
+def heuristic(state):
+    """
+    Manhattan distance plus linear conflicts. Admissible, so A* will find an optimal solution with it
+    :param state: 2D numpy array with the board values
+    :return: lower bound for the number of moves needed to solve the board
+    """
+    cells = [int(v) for v in np.asarray(state).ravel()]
+    width = int(round(len(cells) ** 0.5))
+    manhattan = move_tables(width)[1]
+    h = sum(manhattan[t][i] for i, t in enumerate(cells))
+    h += sum(_row_conflict(cells, width, k) + _col_conflict(cells, width, k) for k in range(width))
+    return h
+
+
+def astar(state, stats=None):
+    """
+    Iterative A* search with Manhattan distance and linear conflicts on packed integer states.
+    Nodes live in a puzzle_nodes.NodePool and the open list is a bucket queue of node indices per (f, h), so no
+    Python object is kept per state. The move list is reconstructed from the parent indices once the goal is found.
+    Boards up to puzzle_rank.DENSE_MAX_WIDTH keep their closed set in a puzzle_rank.VisitedSet and may hold a state
+    in several open nodes, larger boards look up the node of every state in the hash index of the pool instead.
+    :param state: 2D numpy array with the board values, 0 is the empty field
+    :param stats: optional puzzle_stats.SearchStats that receives the counters of the search
+    :return: list of moves (see MOVES) that solves the board
+    :raises ValueError: if the board is not solvable, the search would run through half of all states first
+    """
+    if not is_solvable(state):
+        raise ValueError("Board is not solvable!")
+    cells = [int(v) for v in np.asarray(state).ravel()]
+    width = int(round(len(cells) ** 0.5))
+    size = width * width
+    bits = cell_bits(width)
+    mask = (1 << bits) - 1
+    neighbors, manhattan = move_tables(width)
+    goal = goal_code(width)
+
+    closed = VisitedSet(width) if width <= DENSE_MAX_WIDTH else None
+    pool = NodePool(width, indexed=closed is None)
+    costs = pool.costs
+    # buckets[f][h] holds the open nodes with these values, the lowest h of the lowest f is expanded first. The
+    # heuristic of a node is the h of its bucket, it is not stored anywhere else.
+    buckets = []
+
+    h = heuristic(cells)
+    pool.add(encode(cells), -1, 0)
+    buckets.extend([] for _ in range(h + 1))
+    buckets[h].extend(array('i') for _ in range(h + 1))
+    buckets[h][h].append(0)
+    open_nodes = 1
+    peak = 1
+    expanded = 0
+    generated = 0
+
+    moves = None
+    f = h
+    while f < len(buckets):
+        row = buckets[f]
+        for h, bucket in enumerate(row):
+            if bucket:
+                break
+        else:
+            # the heuristic is consistent, so f never decreases
+            f += 1
+            continue
+        node = bucket.pop()
+        open_nodes -= 1
+        if costs[node] + h != f:
+            # outdated entry, the node has been reached on a cheaper path in the meantime
+            continue
+        code = pool.states[node]
+        if code == goal:
+            moves = [MOVES[m] for m in pool.path(node)]
+            break
+        if closed is not None and not closed.add(code):
+            # the state has already been expanded from another node, which was not more expensive
+            continue
+        expanded += 1
+
+        g = costs[node]
+        cells = [(code >> (i * bits)) & mask for i in range(size)]
+        blank = cells.index(0)
+        for m, target in neighbors[blank]:
+            tile = cells[target]
+            child = code + (tile << (blank * bits)) - (tile << (target * bits))
+            child_g = g + 1
+            if closed is None:
+                # with a consistent heuristic an expanded node is never reached on a cheaper path, so the cost
+                # check also skips the closed states
+                existing = pool.find(child)
+                if existing >= 0 and costs[existing] <= child_g:
+                    continue
+            elif child in closed:
+                continue
+            else:
+                existing = -1
+
+            # update the heuristic incrementally: only the moved tile and the two lines it leaves/enters change
+            if m < 2:
+                conflict, lines = _row_conflict, (blank // width, target // width)
+            else:
+                conflict, lines = _col_conflict, (blank % width, target % width)
+            child_h = h - manhattan[tile][target] + manhattan[tile][blank]
+            child_h -= conflict(cells, width, lines[0]) + conflict(cells, width, lines[1])
+            cells[blank], cells[target] = tile, 0
+            child_h += conflict(cells, width, lines[0]) + conflict(cells, width, lines[1])
+            cells[blank], cells[target] = 0, tile
+
+            if existing >= 0:
+                pool.update(existing, node, child_g)
+            else:
+                existing = pool.add(child, node, child_g)
+            child_f = child_g + child_h
+            while len(buckets) <= child_f:
+                buckets.append([])
+            child_row = buckets[child_f]
+            while len(child_row) <= child_h:
+                child_row.append(array('i'))
+            child_row[child_h].append(existing)
+            open_nodes += 1
+            generated += 1
+        if open_nodes > peak:
+            peak = open_nodes
+
+    if stats is not None:
+        stats.record(expanded, generated, peak)
+    return moves
+
+
+def bidirectional(state, stats=None):
+    """
+    Bidirectional breadth first search that grows one layer of the smaller frontier at a time, from the start
+    and from the goal, until the two searches meet. Each side keeps its states in a puzzle_nodes.NodePool (the
+    cost of a node is its depth), the frontiers are arrays of node indices. The two half paths are spliced at the
+    best meeting state of the layer.
+    :param state: 2D numpy array with the board values, 0 is the empty field
+    :param stats: optional puzzle_stats.SearchStats that receives the counters of the search
+    :return: list of moves (see MOVES) that solves the board
+    :raises ValueError: if the board is not solvable, the search would run through half of all states first
+    """
+    if not is_solvable(state):
+        raise ValueError("Board is not solvable!")
+    cells = [int(v) for v in np.asarray(state).ravel()]
+    width = int(round(len(cells) ** 0.5))
+    size = width * width
+    bits = cell_bits(width)
+    mask = (1 << bits) - 1
+    neighbors = move_tables(width)[0]
+
+    start = encode(cells)
+    goal = goal_code(width)
+    if start == goal:
+        if stats is not None:
+            stats.record(0, 0, 1)
+        return []
+
+    pools = (NodePool(width), NodePool(width))
+    pools[0].add(start, -1, 0)
+    pools[1].add(goal, -1, 0)
+    frontiers = [array('i', [0]), array('i', [0])]
+    expanded = 0
+    peak = 2
+
+    moves = None
+    while frontiers[0] and frontiers[1]:
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        own, other = pools[side], pools[1 - side]
+        expanded += len(frontiers[side])
+        layer = array('i')
+        meeting = None
+        for node in frontiers[side]:
+            code = own.states[node]
+            depth = own.costs[node] + 1
+            cells = [(code >> (i * bits)) & mask for i in range(size)]
+            blank = cells.index(0)
+            for m, target in neighbors[blank]:
+                tile = cells[target]
+                child = code + (tile << (blank * bits)) - (tile << (target * bits))
+                if own.find(child) >= 0:
+                    continue
+                layer.append(own.add(child, node, depth))
+                match = other.find(child)
+                if match >= 0 and (meeting is None or other.costs[match] < other.costs[meeting[1]]):
+                    meeting = (layer[-1], match)
+        frontiers[side] = layer
+        peak = max(peak, len(frontiers[0]) + len(frontiers[1]))
+        if meeting is not None:
+            if side == 1:
+                meeting = (meeting[1], meeting[0])
+            moves = _splice(pools, meeting)
+            break
+
+    if stats is not None:
+        # every stored node has been generated once, except the start and the goal
+        stats.record(expanded, len(pools[0]) + len(pools[1]) - 2, peak)
+    return moves
+
+
+def _splice(pools, meeting):
+    """
+    Joins the half paths of a bidirectional search. Private helper, do not call from the outside
+    :param pools: nodes of the forward and the backward search
+    :param meeting: indices of the meeting state in both pools
+    :return: list of moves from the start to the goal
+    """
+    moves = [MOVES[m] for m in pools[0].path(meeting[0])]
+    # the backward search moved away from the goal, so its moves are taken in opposite direction (up <-> down,
+    # left <-> right)
+    backward = pools[1].path(meeting[1])
+    moves.extend(MOVES[m ^ 1] for m in reversed(backward))
+    return moves
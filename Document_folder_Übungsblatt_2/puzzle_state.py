@@ -0,0 +1,48 @@
+import numpy as np
+
+
+def cell_bits(width):
+    """
+    Number of bits used to store one field of a board of the given width in a packed state
+    :param width: width of the square board
+    :return: bits per field
+    """
+    return max(1, (width * width - 1).bit_length())
+
+
+def encode(state):
+    """
+    Packs a board state into a single integer. Field i (in row major order) is stored at bit i * cell_bits(width)
+    :param state: 2D numpy array (or flat sequence) with the board values, 0 is the empty field
+    :return: the packed state
+    """
+    cells = np.asarray(state).ravel()
+    width = int(round(len(cells) ** 0.5))
+    bits = cell_bits(width)
+    code = 0
+    for i, v in enumerate(cells):
+        code |= int(v) << (i * bits)
+    return code
+
+
+def decode(code, width):
+    """
+    Unpacks a state created by encode()
+    :param code: the packed state
+    :param width: width of the square board
+    :return: 2D numpy array with the board values
+    """
+    bits = cell_bits(width)
+    mask = (1 << bits) - 1
+    cells = [(code >> (i * bits)) & mask for i in range(width * width)]
+    return np.array(cells, dtype=np.uint8).reshape((width, width))
+
+
+def goal_code(width):
+    """
+    Packed state of the solved board (1, 2, ..., width**2 - 1, 0)
+    :param width: width of the square board
+    :return: the packed goal state
+    """
+    goal = list(range(1, width * width)) + [0]
+    return encode(goal)
@@ -0,0 +1,32 @@
+class SearchStats(object):
+    """
+    Hook object the search engines report their counters to instead of printing them. Pass an instance as the
+    stats argument of a solver; the counters of several runs add up, the peak frontier is the maximum.
+    """
+    def __init__(self):
+        """
+        Constructor. All counters start at 0
+        """
+        self.runs = 0
+        self.expanded = 0
+        self.generated = 0
+        self.peak_frontier = 0
+
+    def record(self, expanded, generated, frontier):
+        """
+        Called by a search engine once per solved board
+        :param expanded: number of states whose successors were generated
+        :param generated: number of successor states created
+        :param frontier: largest number of states the search had to keep open at once
+        """
+        self.runs += 1
+        self.expanded += expanded
+        self.generated += generated
+        self.peak_frontier = max(self.peak_frontier, frontier)
+
+    def as_dict(self):
+        """
+        :return: the counters as a dict
+        """
+        return {'runs': self.runs, 'expanded': self.expanded, 'generated': self.generated,
+                'peak_frontier': self.peak_frontier}
@@ -0,0 +1,128 @@
+import os
+
+import numpy as np
+
+from puzzle_random import is_solvable
+from puzzle_rank import num_states, rank
+from puzzle_solver import MOVES, move_tables
+
+# marks states the retrograde search has not reached (can not happen for solvable states)
+UNKNOWN = 255
+
+DATA_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def table_path(width=3, folder=DATA_FOLDER):
+    """
+    Default file name of the distance table for the given width
+    :param width: width of the square board
+    :param folder: folder the table is stored in
+    :return: path of the .npy file
+    """
+    return os.path.join(folder, 'distances{0}.npy'.format(width))
+
+
+def build_table(width=3):
+    """
+    Retrograde breadth first search from the goal over all solvable states. Moves are reversible, so the
+    BFS layer of a state is its optimal distance to the goal.
+    :param width: width of the square board. Only small boards are feasible (3 has 181440 states)
+    :return: uint8 numpy array indexed by puzzle_rank.rank() holding the optimal number of moves
+    """
+    neighbors = move_tables(width)[0]
+    table = np.full(num_states(width), UNKNOWN, dtype=np.uint8)
+
+    goal = tuple(range(1, width * width)) + (0,)
+    table[rank(goal)] = 0
+    frontier = [goal]
+    depth = 0
+    while frontier:
+        depth += 1
+        if depth >= UNKNOWN:
+            raise ValueError("distances do not fit into the table")
+        layer = []
+        for cells in frontier:
+            blank = cells.index(0)
+            for _, target in neighbors[blank]:
+                child = list(cells)
+                child[blank], child[target] = child[target], 0
+                r = rank(child)
+                if table[r] == UNKNOWN:
+                    table[r] = depth
+                    layer.append(tuple(child))
+        frontier = layer
+    return table
+
+
+def save_table(table, path):
+    """
+    Stores a distance table in the numpy file format
+    :param table: table created by build_table()
+    :param path: target file
+    """
+    folder = os.path.dirname(path)
+    if folder and not os.path.isdir(folder):
+        os.makedirs(folder)
+    np.save(path, table)
+
+
+def load_table(width=3, path=None):
+    """
+    Opens the distance table as a read only memory map. The table is built and saved first if the file does
+    not exist yet, so only the very first call pays for the retrograde search.
+    :param width: width of the square board
+    :param path: file of the table, defaults to table_path(width)
+    :return: read only numpy memmap indexed by puzzle_rank.rank()
+    """
+    if path is None:
+        path = table_path(width)
+    if not os.path.exists(path):
+        save_table(build_table(width), path)
+    table = np.load(path, mmap_mode='r')
+    if table.shape != (num_states(width),):
+        raise ValueError("{0} is not a distance table for width {1}".format(path, width))
+    return table
+
+
+def solve_with_table(state, table, stats=None):
+    """
+    Solves a board without searching by following the distance table down to 0. Every step picks a
+    neighbor that is one move closer to the goal, so the result is optimal.
+    :param state: 2D numpy array with the board values, 0 is the empty field
+    :param table: table returned by load_table() or build_table() for the width of the board
+    :param stats: optional puzzle_stats.SearchStats that receives the counters of the descent
+    :return: list of moves (see puzzle_solver.MOVES) that solves the board
+    """
+    # rank() maps unsolvable boards into the range of the solvable ones, so they must be rejected first
+    if not is_solvable(state):
+        raise ValueError("Board is not solvable!")
+    cells = [int(v) for v in np.asarray(state).ravel()]
+    width = int(round(len(cells) ** 0.5))
+    neighbors = move_tables(width)[0]
+    dist = int(table[rank(cells)])
+
+    moves = []
+    blank = cells.index(0)
+    generated = 0
+    while dist > 0:
+        for m, target in neighbors[blank]:
+            cells[blank], cells[target] = cells[target], 0
+            generated += 1
+            if table[rank(cells)] == dist - 1:
+                moves.append(MOVES[m])
+                blank = target
+                dist -= 1
+                break
+            cells[target], cells[blank] = cells[blank], 0
+        else:
+            raise ValueError("distance table is inconsistent")
+    if stats is not None:
+        stats.record(len(moves), generated, 1)
+    return moves
+
+
+if __name__ == "__main__":
+    # build the table once, later calls of load_table() just map the file
+    path = table_path(3)
+    save_table(build_table(3), path)
+    print("saved", path)
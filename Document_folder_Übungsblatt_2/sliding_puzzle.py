@@ -1,14 +1,24 @@
+import os
+
 import numpy as np
-import matplotlib
-matplotlib.use('Qt5Agg') # for PyCharm
-import matplotlib.pyplot as plt
-from matplotlib.colors import LinearSegmentedColormap
+from puzzle_random import is_solvable, random_state
+
+# global renderer of the plot to conserve memory
+renderer = None
+
+
+def _pyplot():
+    """
+    Imports pyplot on the first plot, so boards and solvers work with numpy alone and without a display.
+    Private helper, do not call from the outside
+    :return: the matplotlib.pyplot module
+    """
+    import matplotlib
+    if 'MPLBACKEND' not in os.environ:
+        matplotlib.use('Qt5Agg') # for PyCharm
+    import matplotlib.pyplot as plt
+    return plt
 
-# global variables for the plot to conserve memory
-fig = None
-ax = None
-texts = []
-implot = None
 
 class Board(object):
     def __init__(self, width=4, inputs=None):
@@ -47,41 +57,19 @@ class Board(object):
         plots the current board state using matplotlib
         :param interactive: if True the function will reuse the plot from a previous call. If false a new plot will be generated for each call
         """
-        global fig
-        global ax
-        global texts
-        global implot
+        global renderer
+        from puzzle_render import PuzzleRenderer
 
+        plt = _pyplot()
         if interactive:
             plt.ion()
 
         # if this is the first time this function is called
-        if not interactive or fig is None:
-            fig = plt.figure()
-            ax = fig.add_subplot(111)
-            colors = [(0.0, 0.0, 0.0, 1.0), (1.0, 1.0, 1.0, 1.0)]
-            cmap = LinearSegmentedColormap.from_list('Custom cmap', colors,2)
-            ax.clear()
-            state = np.copy(self.state)
-            state[state > 0] = 1
-            implot = ax.imshow(state, cmap=cmap, interpolation='nearest')
-            # Shift grid to be at 0.5, 1.5, etc
-            locs = np.arange(state.shape[0])
-            for axis in [ax.xaxis, ax.yaxis]:
-                axis.set_ticks(locs + 0.5, minor=True)
-                axis.set(ticks=[], ticklabels=[])
-            ax.grid(True, which='minor')
-        else:
-            for t in texts:
-                t.remove()
-            texts.clear()
-        for i in range(self.width):
-            for j in range(self.width):
-                c = self.state.T[i, j]
-                texts.append(ax.text(i, j, str(c), va='center', ha='center', size=20))
-
-        plt.draw()
-        plt.pause(1e-3)
+        if not interactive or renderer is None or len(renderer.texts) != self.state.size:
+            renderer = PuzzleRenderer(self.state, plt.figure())
+            plt.show(block=False)
+        # the artists are updated in place, the grid is restored from the cached background
+        renderer.draw(self.state)
 
     def __create_board(self, width, inputs=None):
         """
@@ -90,12 +78,10 @@ class Board(object):
         :param inputs: number of input values
         """
         if inputs is None:
-            self.state = np.arange(1, width ** 2 + 1, dtype=np.uint8).reshape((width, width))
-            self.state.flat[-1] = 0  # last field is 0 = empty
-            # shuffle the board while not solvable
-
-            while not self.solvable() or self.solved():
-                np.random.shuffle(self.state.flat)
+            # uniformly random solvable board, only the (very unlikely) solved board is drawn again
+            self.state = random_state(width).reshape((width, width))
+            while self.solved():
+                self.state = random_state(width).reshape((width, width))
 
         else:
             self.state = np.asarray(inputs).reshape((width, width))
@@ -116,27 +102,10 @@ class Board(object):
 
     def solvable(self):
         """
-        Check if the puzzle is solvable by counting the number of inversions
+        Check if the puzzle is solvable by counting the number of inversions (see puzzle_random.is_solvable)
         :return: True if solvable, False otherwise
         """
-
-        inversions = 0
-        s = self.state
-        for i, v in enumerate(s[np.nonzero(s)]):
-            j = i + 1
-            while j < s.size:
-                if s.flat[j] < v and s.flat[j] != 0:
-                    inversions += 1
-                j += 1
-        size = s.shape[0]
-        # grid width is odd and number of inversion even -> solvable
-        if size % 2 != 0 and inversions % 2 == 0:
-            return True
-        # grid width is even
-        if size % 2 == 0:
-            emptyrow = size - np.where(self.state == 0)[0][0]
-            return (emptyrow % 2 != 0) == (inversions % 2 == 0)
-        return False
+        return is_solvable(self.state)
 
     def move(self, direction):
         """
@@ -156,4 +125,4 @@ if __name__ == "__main__":
     # Todo CALL SOLVER HERE!
 
     # show the (solved) board
-    plt.show(block=True)
\ No newline at end of file
+    _pyplot().show(block=True)
\ No newline at end of file
@@ -0,0 +1,334 @@
+import argparse
+import heapq
+import os
+import time
+
+import numpy as np
+
+# arrays of a stored hierarchy, one .npy file each. Both edge lists are indexed by the lower ranked end node:
+# up_* are the edges to higher ranked nodes, down_* the reversed edges from higher ranked nodes
+ARRAYS = ('rank', 'up_offsets', 'up_targets', 'up_costs', 'up_middle',
+          'down_offsets', 'down_targets', 'down_costs', 'down_middle')
+
+
+class ContractionHierarchy(object):
+    """
+    Contraction hierarchy of a road graph for one weight. Every node has a rank (the order it was contracted in),
+    shortcut edges replace the shortest paths over lower ranked nodes, so a query only has to go upwards from both
+    ends and meets at the highest node of the route. A shortcut remembers the node it skipped (middle, -1 for
+    original edges), which is used to unpack it into the original route.
+    """
+    def __init__(self, rank, up_offsets, up_targets, up_costs, up_middle,
+                 down_offsets, down_targets, down_costs, down_middle):
+        """
+        Constructor, use build() or load_hierarchy() to get one
+        :param rank: int32 contraction order per node
+        :param up_offsets: int64 array of n + 1 offsets into the up_* arrays
+        :param up_targets: int32 higher ranked target per upward edge
+        :param up_costs: float64 cost per upward edge
+        :param up_middle: int32 skipped node per upward edge, -1 for original edges
+        :param down_offsets: int64 array of n + 1 offsets into the down_* arrays
+        :param down_targets: int32 higher ranked source per downward edge
+        :param down_costs: float64 cost per downward edge
+        :param down_middle: int32 skipped node per downward edge, -1 for original edges
+        """
+        self.rank = rank
+        self.up_offsets = up_offsets
+        self.up_targets = up_targets
+        self.up_costs = up_costs
+        self.up_middle = up_middle
+        self.down_offsets = down_offsets
+        self.down_targets = down_targets
+        self.down_costs = down_costs
+        self.down_middle = down_middle
+
+        # query loops run on memoryviews, indexing numpy arrays element by element is much slower
+        self.__rank = memoryview(rank)
+        self.__up = [memoryview(a) for a in (up_offsets, up_targets, up_costs, up_middle)]
+        self.__down = [memoryview(a) for a in (down_offsets, down_targets, down_costs, down_middle)]
+
+    def __len__(self):
+        return len(self.rank)
+
+    @property
+    def num_shortcuts(self):
+        return int(np.count_nonzero(np.asarray(self.up_middle) >= 0) +
+                   np.count_nonzero(np.asarray(self.down_middle) >= 0))
+
+    def query(self, source, target):
+        """
+        Bidirectional Dijkstra, forward on the upward edges from the source and backward on the downward edges
+        from the target
+        :param source: index of the start node
+        :param target: index of the target node
+        :return: (list of node indices or None if target can not be reached, cost, number of settled nodes)
+        """
+        source, target = int(source), int(target)
+        searches = ((self.__up, {source: 0.0}, {source: (-1, -1)}, [(0.0, source)], set()),
+                    (self.__down, {target: 0.0}, {target: (-1, -1)}, [(0.0, target)], set()))
+        best, meet = float('inf'), -1
+        side = 0
+        while True:
+            # a direction stops when its smallest distance can not improve the best route anymore
+            active = [i for i in (0, 1) if searches[i][3] and searches[i][3][0][0] < best]
+            if not active:
+                break
+            side = side ^ 1 if side ^ 1 in active else active[0]
+            (offsets, targets, costs, _), dist, parents, queue, closed = searches[side]
+            cost, node = heapq.heappop(queue)
+            if node in closed:
+                continue
+            closed.add(node)
+            other = searches[side ^ 1][1].get(node)
+            if other is not None and cost + other < best:
+                best, meet = cost + other, node
+            for e in range(offsets[node], offsets[node + 1]):
+                child = targets[e]
+                new_cost = cost + costs[e]
+                if new_cost < dist.get(child, float('inf')):
+                    dist[child] = new_cost
+                    parents[child] = (node, e)
+                    heapq.heappush(queue, (new_cost, child))
+
+        settled = len(searches[0][4]) + len(searches[1][4])
+        if meet < 0:
+            return None, float('inf'), settled
+
+        # source -> meet on upward edges, meet -> target on downward edges
+        forward = []
+        node = meet
+        while searches[0][2][node][0] >= 0:
+            parent, e = searches[0][2][node]
+            forward.append((parent, node, self.__up[3][e]))
+            node = parent
+        forward.reverse()
+        backward = []
+        node = meet
+        while searches[1][2][node][0] >= 0:
+            parent, e = searches[1][2][node]
+            backward.append((node, parent, self.__down[3][e]))
+            node = parent
+
+        route = [source]
+        for u, v, middle in forward + backward:
+            route.extend(self.__unpack(u, v, middle)[1:])
+        return route, best, settled
+
+    def __find(self, u, v):
+        """
+        Private helper to look up the skipped node of the edge u -> v. Do not call from the outside.
+        """
+        if self.__rank[u] < self.__rank[v]:
+            offsets, targets, _, middle = self.__up
+            node, other = u, v
+        else:
+            offsets, targets, _, middle = self.__down
+            node, other = v, u
+        for e in range(offsets[node], offsets[node + 1]):
+            if targets[e] == other:
+                return middle[e]
+        raise KeyError((u, v))
+
+    def __unpack(self, u, v, middle):
+        """
+        Private helper to replace a (shortcut) edge by the original nodes. Do not call from the outside.
+        :return: list of nodes from u to v
+        """
+        route = [u]
+        stack = [(u, v, middle)]
+        while stack:
+            a, b, m = stack.pop()
+            if m < 0:
+                route.append(b)
+            else:
+                # the first half is unpacked first, so it goes on the stack last
+                stack.append((m, b, self.__find(m, b)))
+                stack.append((a, m, self.__find(a, m)))
+        return route
+
+
+def _witness_search(out, source, skip, max_cost, max_settled):
+    """
+    Local Dijkstra that looks for paths around a node. Private helper, do not call from the outside
+    :param out: adjacency dicts node -> {target: (cost, middle)} of the remaining graph
+    :param source: start node
+    :param skip: node that is contracted, it is not used
+    :param max_cost: the search stops at this distance
+    :param max_settled: the search stops after this many nodes, a missing witness only costs a shortcut
+    :return: dict of the found distances
+    """
+    dist = {source: 0.0}
+    queue = [(0.0, source)]
+    settled = 0
+    while queue and settled < max_settled:
+        cost, node = heapq.heappop(queue)
+        if cost > dist[node]:
+            continue
+        if cost > max_cost:
+            break
+        settled += 1
+        for child, (c, _) in out[node].items():
+            if child == skip:
+                continue
+            new_cost = cost + c
+            if new_cost < dist.get(child, float('inf')):
+                dist[child] = new_cost
+                heapq.heappush(queue, (new_cost, child))
+    return dist
+
+
+def _shortcuts(out, inn, node, max_settled):
+    """
+    Shortcuts that are needed if a node is contracted. Private helper, do not call from the outside
+    :return: list of (source, target, cost)
+    """
+    result = []
+    targets = out[node]
+    if not targets:
+        return result
+    longest = max(c for c, _ in targets.values())
+    for u, (cost_in, _) in inn[node].items():
+        dist = _witness_search(out, u, node, cost_in + longest, max_settled)
+        for w, (cost_out, _) in targets.items():
+            if w != u and dist.get(w, float('inf')) > cost_in + cost_out:
+                result.append((u, w, cost_in + cost_out))
+    return result
+
+
+def _priority(out, inn, node, deleted, max_settled):
+    """
+    Edge difference (added shortcuts - removed edges) plus the contracted neighbours, so the contraction spreads
+    evenly over the graph. Private helper, do not call from the outside
+    """
+    return len(_shortcuts(out, inn, node, max_settled)) - len(out[node]) - len(inn[node]) + deleted[node]
+
+
+def _to_csr(edges, n):
+    """
+    Private helper to pack per node edge lists into CSR arrays. Do not call from the outside
+    :param edges: list per node of (other node, cost, middle)
+    :return: offsets, targets, costs, middle
+    """
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in edges], out=offsets[1:])
+    flat = [edge for e in edges for edge in e]
+    targets = np.array([e[0] for e in flat], dtype=np.int32)
+    costs = np.array([e[1] for e in flat], dtype=np.float64)
+    middle = np.array([e[2] for e in flat], dtype=np.int32)
+    return offsets, targets, costs, middle
+
+
+def build(graph, weight='length', max_settled=50, verbose=False):
+    """
+    Contracts all nodes of a graph, the node with the smallest priority (see _priority()) first. Priorities are
+    updated lazily: a node is only contracted if its recomputed priority is still the smallest.
+    :param graph: graph_csr.CSRGraph
+    :param weight: one of routing.WEIGHTS
+    :param max_settled: node limit of the witness searches, smaller values build faster but add more shortcuts
+    :param verbose: print the progress
+    :return: ContractionHierarchy
+    """
+    n = len(graph)
+    offsets = np.asarray(graph.offsets).tolist()
+    targets = np.asarray(graph.targets).tolist()
+    costs = np.asarray(graph.weights(weight), dtype=np.float64).tolist()
+    out = [{} for _ in range(n)]
+    inn = [{} for _ in range(n)]
+    for u in range(n):
+        for e in range(offsets[u], offsets[u + 1]):
+            v = targets[e]
+            if v != u:
+                out[u][v] = (costs[e], -1)
+                inn[v][u] = (costs[e], -1)
+
+    deleted = [0] * n
+    queue = [(_priority(out, inn, v, deleted, max_settled), v) for v in range(n)]
+    heapq.heapify(queue)
+    rank = np.zeros(n, dtype=np.int32)
+    up = [None] * n
+    down = [None] * n
+    order = 0
+    start = time.time()
+    while queue:
+        _, v = heapq.heappop(queue)
+        priority = _priority(out, inn, v, deleted, max_settled)
+        if queue and priority > queue[0][0]:
+            heapq.heappush(queue, (priority, v))
+            continue
+
+        for u, w, cost in _shortcuts(out, inn, v, max_settled):
+            if cost < out[u].get(w, (float('inf'), -1))[0]:
+                out[u][w] = (cost, v)
+                inn[w][u] = (cost, v)
+        up[v] = [(w, c, m) for w, (c, m) in out[v].items()]
+        down[v] = [(u, c, m) for u, (c, m) in inn[v].items()]
+        for w in out[v]:
+            del inn[w][v]
+            deleted[w] += 1
+        for u in inn[v]:
+            del out[u][v]
+            deleted[u] += 1
+        out[v], inn[v] = {}, {}
+        rank[v] = order
+        order += 1
+        if verbose and order % 10000 == 0:
+            print("{0}/{1} nodes contracted, {2:.0f} s".format(order, n, time.time() - start))
+
+    return ContractionHierarchy(rank, *(_to_csr(up, n) + _to_csr(down, n)))
+
+
+def save_hierarchy(ch, folder):
+    """
+    Stores a hierarchy as one .npy file per array
+    :param ch: ContractionHierarchy
+    :param folder: folder for the files, created if missing
+    """
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    for name in ARRAYS:
+        np.save(os.path.join(folder, name + '.npy'), np.ascontiguousarray(getattr(ch, name)))
+
+
+def load_hierarchy(folder):
+    """
+    Memory maps a hierarchy written by save_hierarchy()
+    :param folder: folder of the files
+    :return: ContractionHierarchy
+    """
+    return ContractionHierarchy(*[np.load(os.path.join(folder, name + '.npy'), mmap_mode='r') for name in ARRAYS])
+
+
+if __name__ == "__main__":
+    from graph_csr import load_csr
+    from routing import WEIGHTS, astar
+
+    parser = argparse.ArgumentParser(description="Builds a contraction hierarchy and compares queries with A*")
+    parser.add_argument('graph', help="folder of a graph stored with graph_csr.save_csr()")
+    parser.add_argument('--weight', choices=WEIGHTS, default='length')
+    parser.add_argument('--output', help="folder of the hierarchy, default: <graph>/ch_<weight>")
+    parser.add_argument('--queries', type=int, default=100, help="number of random queries to compare")
+    args = parser.parse_args()
+
+    graph = load_csr(args.graph)
+    output = args.output or os.path.join(args.graph, 'ch_' + args.weight)
+    if os.path.isdir(output):
+        ch = load_hierarchy(output)
+    else:
+        start = time.time()
+        ch = build(graph, args.weight, verbose=True)
+        save_hierarchy(ch, output)
+        print("built in {0:.1f} s, {1} shortcuts".format(time.time() - start, ch.num_shortcuts))
+
+    rng = np.random.RandomState(0)
+    times = {'ch': 0.0, 'astar': 0.0}
+    for source, target in rng.randint(len(graph), size=(args.queries, 2)):
+        start = time.perf_counter()
+        route, cost, _ = ch.query(source, target)
+        times['ch'] += time.perf_counter() - start
+        start = time.perf_counter()
+        expected = astar(graph, source, target, args.weight)[1]
+        times['astar'] += time.perf_counter() - start
+        if abs(cost - expected) > 1e-6 * max(1.0, expected):
+            print("mismatch", source, target, cost, expected)
+    for name, t in sorted(times.items()):
+        print("{0:<6} {1:.3f} ms per query".format(name, 1000 * t / args.queries))
@@ -0,0 +1,130 @@
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from graph_csr import load_csr
+
+# graph of the worker process, memory mapped once by _init_worker()
+_shared = {}
+
+
+def one_to_many(graph, source, targets, weight='length'):
+    """
+    Dijkstra from one node that stops as soon as all targets are settled
+    :param graph: graph_csr.CSRGraph
+    :param source: index of the start node
+    :param targets: indices of the target nodes
+    :param weight: one of routing.WEIGHTS
+    :return: float64 array of the costs to the targets, inf for targets that can not be reached
+    """
+    source = int(source)
+    offsets = memoryview(graph.offsets)
+    edge_targets = memoryview(graph.targets)
+    costs = memoryview(graph.weights(weight))
+
+    remaining = set(int(t) for t in targets)
+    best = {source: 0.0}
+    closed = set()
+    queue = [(0.0, source)]
+    while queue and remaining:
+        cost, node = heapq.heappop(queue)
+        if node in closed:
+            continue
+        closed.add(node)
+        remaining.discard(node)
+        for e in range(offsets[node], offsets[node + 1]):
+            child = edge_targets[e]
+            new_cost = cost + costs[e]
+            if new_cost < best.get(child, float('inf')):
+                best[child] = new_cost
+                heapq.heappush(queue, (new_cost, child))
+    return np.array([best[t] if t in closed else np.inf for t in map(int, targets)])
+
+
+def _init_worker(folder):
+    """
+    Memory maps the graph in a worker process. All workers share the pages of the files read only.
+    Private helper, do not call from the outside
+    """
+    _shared['graph'] = load_csr(folder)
+
+
+def _rows(chunk, targets, weight):
+    """
+    Computes the rows of a chunk of sources in a worker process. Private helper, do not call from the outside
+    :param chunk: list of (row, source) pairs
+    :return: list of (row, costs) pairs
+    """
+    return [(row, one_to_many(_shared['graph'], source, targets, weight)) for row, source in chunk]
+
+
+def distance_matrix(folder, sources, targets, weight='length', workers=None, chunksize=4):
+    """
+    Costs from every source to every target. Every source runs one Dijkstra, the sources are spread over a
+    process pool.
+    :param folder: folder of a graph stored with graph_csr.save_csr(), the workers map it instead of receiving a copy
+    :param sources: indices of the start nodes
+    :param targets: indices of the target nodes
+    :param weight: one of routing.WEIGHTS
+    :param workers: number of worker processes, defaults to the number of cores, 1 computes everything here
+    :param chunksize: number of sources sent to a worker at once
+    :return: float32 array of shape (len(sources), len(targets)), inf for pairs without a route
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    sources = [int(s) for s in sources]
+    targets = [int(t) for t in targets]
+    matrix = np.full((len(sources), len(targets)), np.inf, dtype=np.float32)
+    if not sources or not targets:
+        return matrix
+
+    rows = list(enumerate(sources))
+    chunks = [rows[start:start + chunksize] for start in range(0, len(rows), chunksize)]
+    if workers == 1:
+        _init_worker(folder)
+        results = [_rows(c, targets, weight) for c in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(folder,)) as pool:
+            results = list(pool.map(_rows, chunks, [targets] * len(chunks), [weight] * len(chunks)))
+    for result in results:
+        for row, costs in result:
+            matrix[row] = costs
+    return matrix
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    import networkx as nx
+
+    parser = argparse.ArgumentParser(description="Computes a random distance matrix and compares it with networkx")
+    parser.add_argument('graph', help="folder of a graph stored with graph_csr.save_csr()")
+    parser.add_argument('--size', type=int, default=100, help="number of sources and of targets")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--check', type=int, default=200, help="number of pairs compared with nx.shortest_path")
+    args = parser.parse_args()
+
+    graph = load_csr(args.graph)
+    rng = np.random.RandomState(0)
+    sources, targets = rng.randint(len(graph), size=(2, args.size))
+    start = time.time()
+    matrix = distance_matrix(args.graph, sources, targets, workers=args.workers)
+    elapsed = time.time() - start
+    print("{0}x{0} matrix in {1:.2f} s".format(args.size, elapsed))
+
+    G = nx.DiGraph()
+    G.add_weighted_edges_from(zip(np.repeat(np.arange(len(graph)), np.diff(graph.offsets)).tolist(),
+                                  np.asarray(graph.targets).tolist(), np.asarray(graph.length).tolist()))
+    start = time.time()
+    for i, j in rng.randint(args.size, size=(args.check, 2)):
+        try:
+            expected = nx.shortest_path_length(G, int(sources[i]), int(targets[j]), weight='weight')
+        except (nx.NetworkXNoPath, nx.NodeNotFound):
+            expected = np.inf
+        if not np.isclose(matrix[i, j], expected, rtol=1e-5):
+            print("mismatch", sources[i], targets[j], matrix[i, j], expected)
+    per_pair = (time.time() - start) / args.check
+    print("networkx: {0:.2f} s estimated for all pairs".format(per_pair * args.size * args.size))
@@ -0,0 +1,119 @@
+import json
+import os
+import re
+
+import numpy as np
+
+
+def normalize(address):
+    """
+    Key of an address in the cache, so small differences in spelling hit the same entry
+    :param address: address as string
+    :return: lower case address with single spaces and ', ' between the parts
+    """
+    parts = [re.sub(r'\s+', ' ', part).strip() for part in address.casefold().split(',')]
+    return ', '.join(part for part in parts if part)
+
+
+def live_geocoder(address):
+    """
+    Asks the osm servers through osmnx, needs network access
+    :param address: address as string
+    :return: (latitude, longitude)
+    """
+    import osmnx as ox
+    return ox.utils.geocode(address)
+
+
+class Geocoder(object):
+    """
+    Resolves addresses from a local cache stored as JSON. Addresses that are not cached are only looked up with
+    the fallback (usually live_geocoder()) if one is given, its results are added to the cache.
+    """
+    def __init__(self, path=None, fallback=None):
+        """
+        Constructor, loads the cache file if it exists
+        :param path: JSON file of the cache, None for a cache in memory only
+        :param fallback: function address -> (latitude, longitude) for missing addresses, None to stay offline
+        """
+        self.path = path
+        self.fallback = fallback
+        self.positions = {}
+        self.__changed = False
+        if path is not None and os.path.isfile(path):
+            with open(path, encoding='utf-8') as f:
+                self.positions = {key: tuple(value) for key, value in json.load(f).items()}
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, address):
+        return normalize(address) in self.positions
+
+    def add(self, address, lat, lon):
+        """
+        Adds or replaces an address
+        :param address: address as string
+        :param lat: latitude in degrees
+        :param lon: longitude in degrees
+        """
+        self.positions[normalize(address)] = (float(lat), float(lon))
+        self.__changed = True
+
+    def add_graph(self, G):
+        """
+        Adds the addresses of the nodes of an osmnx graph that have addr:street and addr:housenumber tags (the
+        tags must be in the useful tags of osmnx when the graph is fetched)
+        :param G: networkx graph with x/y node attributes
+        :return: number of added addresses
+        """
+        added = 0
+        for _, data in G.nodes(data=True):
+            street, number = data.get('addr:street'), data.get('addr:housenumber')
+            if street and number:
+                parts = ["{0} {1}".format(street, number), data.get('addr:city'), data.get('addr:country')]
+                self.add(", ".join(p for p in parts if p), data['y'], data['x'])
+                added += 1
+        return added
+
+    def geocode(self, address):
+        """
+        Position of an address
+        :param address: address as string
+        :return: (latitude, longitude)
+        """
+        key = normalize(address)
+        if key not in self.positions:
+            if self.fallback is None:
+                raise KeyError("{0} is not in the geocoding cache".format(address))
+            self.add(address, *self.fallback(address))
+        return self.positions[key]
+
+    def geocode_many(self, addresses):
+        """
+        Positions of many addresses. All missing addresses are reported at once if there is no fallback.
+        :param addresses: list of addresses
+        :return: float64 array of shape (len(addresses), 2) with latitude and longitude
+        """
+        if self.fallback is None:
+            missing = [a for a in addresses if normalize(a) not in self.positions]
+            if missing:
+                raise KeyError("not in the geocoding cache: {0}".format("; ".join(missing)))
+        return np.array([self.geocode(a) for a in addresses], dtype=np.float64).reshape((len(addresses), 2))
+
+    def save(self):
+        """
+        Writes the cache file if something was added. The file is replaced at once, so a crash can not leave
+        half of it behind.
+        """
+        if self.path is None or not self.__changed:
+            return
+        folder = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        temp = self.path + '.tmp'
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump({key: list(value) for key, value in sorted(self.positions.items())}, f, ensure_ascii=False,
+                      indent=1)
+        os.replace(temp, self.path)
+        self.__changed = False
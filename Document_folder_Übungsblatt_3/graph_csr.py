@@ -0,0 +1,144 @@
+import os
+
+import numpy as np
+
+from routing import WEIGHTS, edge_cost, haversine_array
+
+# arrays of a stored graph, one .npy file each
+ARRAYS = ('lat', 'lon', 'osmids', 'offsets', 'targets', 'length', 'time')
+
+
+class CSRGraph(object):
+    """
+    Directed road graph in compressed sparse row layout. Nodes are numbered 0..n-1 in the order of their OSM ids;
+    the out edges of node i are the entries offsets[i]:offsets[i+1] of targets (target node), length (m) and
+    time (s). Of parallel edges only the cheapest per weight is kept. All arrays may be memory mapped.
+    """
+    def __init__(self, lat, lon, osmids, offsets, targets, length, time):
+        """
+        Constructor.
+        :param lat: float64 latitude per node
+        :param lon: float64 longitude per node
+        :param osmids: sorted int64 OSM id per node
+        :param offsets: int64 array of n + 1 edge offsets
+        :param targets: int32 target node per edge
+        :param length: float32 length per edge in m
+        :param time: float32 travel time per edge in s
+        """
+        self.lat = lat
+        self.lon = lon
+        self.osmids = osmids
+        self.offsets = offsets
+        self.targets = targets
+        self.length = length
+        self.time = time
+        self._max_speed = None
+
+    def __len__(self):
+        return len(self.osmids)
+
+    @property
+    def num_edges(self):
+        return len(self.targets)
+
+    def weights(self, weight='length'):
+        """
+        :param weight: one of routing.WEIGHTS
+        :return: the cost array of the weight
+        """
+        if weight not in WEIGHTS:
+            raise ValueError("unknown weight {0}".format(weight))
+        return self.length if weight == 'length' else self.time
+
+    def index(self, osmid):
+        """
+        :param osmid: OSM id of a node
+        :return: index of the node
+        """
+        i = int(np.searchsorted(self.osmids, osmid))
+        if i >= len(self.osmids) or self.osmids[i] != osmid:
+            raise KeyError(osmid)
+        return i
+
+    def max_speed(self):
+        """
+        :return: fastest speed of any edge in m/s, the time heuristic divides the straight line by it
+        """
+        if self._max_speed is None:
+            moving = self.time > 0
+            self._max_speed = float(np.max(self.length[moving] / self.time[moving])) if moving.any() else 1.0
+        return self._max_speed
+
+    def nearest(self, lat, lon):
+        """
+        Node closest to a position, by scanning all nodes
+        :param lat: latitude in degrees
+        :param lon: longitude in degrees
+        :return: index of the node
+        """
+        return int(np.argmin(haversine_array(self.lat, self.lon, lat, lon)))
+
+
+def from_networkx(G):
+    """
+    Converts an osmnx graph
+    :param G: networkx (Multi)DiGraph with x/y node attributes and length (and maxspeed) edge attributes
+    :return: CSRGraph held in memory
+    """
+    osmids = np.array(sorted(G.nodes), dtype=np.int64)
+    index = {osmid: i for i, osmid in enumerate(osmids.tolist())}
+    lat = np.array([G.nodes[n]['y'] for n in osmids.tolist()], dtype=np.float64)
+    lon = np.array([G.nodes[n]['x'] for n in osmids.tolist()], dtype=np.float64)
+
+    # cheapest of the parallel edges per weight
+    best = {}
+    for u, v, data in G.edges(data=True):
+        key = (index[u], index[v])
+        length, time = edge_cost(data, 'length'), edge_cost(data, 'time')
+        if key in best:
+            length, time = min(length, best[key][0]), min(time, best[key][1])
+        best[key] = (length, time)
+
+    keys = sorted(best)
+    sources = np.array([k[0] for k in keys], dtype=np.int64)
+    offsets = np.zeros(len(osmids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=len(osmids)), out=offsets[1:])
+    targets = np.array([k[1] for k in keys], dtype=np.int32)
+    length = np.array([best[k][0] for k in keys], dtype=np.float32)
+    time = np.array([best[k][1] for k in keys], dtype=np.float32)
+    return CSRGraph(lat, lon, osmids, offsets, targets, length, time)
+
+
+def save_csr(graph, folder):
+    """
+    Stores a graph as one .npy file per array
+    :param graph: CSRGraph
+    :param folder: folder for the files, created if missing
+    """
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    for name in ARRAYS:
+        np.save(os.path.join(folder, name + '.npy'), np.ascontiguousarray(getattr(graph, name)))
+
+
+def load_csr(folder):
+    """
+    Memory maps a graph written by save_csr(), only the pages that are used are read from disk
+    :param folder: folder of the files
+    :return: CSRGraph
+    """
+    return CSRGraph(*[np.load(os.path.join(folder, name + '.npy'), mmap_mode='r') for name in ARRAYS])
+
+
+def convert(graphml, folder):
+    """
+    Converts a graphml file of osmnx once, later runs only call load_csr()
+    :param graphml: path of the .graphml file
+    :param folder: output folder
+    :return: the converted CSRGraph
+    """
+    import osmnx as ox
+    G = ox.load_graphml(os.path.basename(graphml), folder=os.path.dirname(graphml) or '.')
+    graph = from_networkx(G)
+    save_csr(graph, folder)
+    return graph
@@ -0,0 +1,141 @@
+import os
+
+import numpy as np
+
+from distance_matrix import one_to_many
+from graph_csr import CSRGraph
+
+# arrays of stored landmarks, one .npy file each
+ARRAYS = ('nodes', 'forward', 'backward')
+
+# distances are stored as uint32 in tenths of the weight unit (decimetres or tenths of seconds)
+SCALE = 10
+
+# stored for nodes that can not be reached
+UNREACHABLE = np.iinfo(np.uint32).max
+
+
+class Landmarks(object):
+    """
+    Distances from and to a few landmark nodes for ALT (A*, landmarks, triangle inequality). For every landmark L
+    and target t, d(v, t) >= d(L, t) - d(L, v) and d(v, t) >= d(v, L) - d(t, L), the largest of these bounds is
+    the heuristic of A*. On a road network it is much tighter than the straight line, because the landmark
+    distances already contain the detours around rivers and the fast motorways.
+    """
+    def __init__(self, nodes, forward, backward):
+        """
+        Constructor, use build() or load_landmarks() to get one
+        :param nodes: int32 index of every landmark
+        :param forward: uint32 array (landmarks, nodes) of the distances from the landmarks, see SCALE
+        :param backward: uint32 array (landmarks, nodes) of the distances to the landmarks, see SCALE
+        """
+        self.nodes = nodes
+        self.forward = forward
+        self.backward = backward
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def bounds(self, target):
+        """
+        Lower bounds of the distance to a target for all nodes
+        :param target: index of the target node
+        :return: float64 array of the bounds in the weight unit, pass it as heuristic to routing.astar()
+        """
+        target = int(target)
+        result = np.zeros(self.forward.shape[1], dtype=np.int64)
+        for forward, backward in zip(self.forward, self.backward):
+            to_target = int(forward[target])
+            from_target = int(backward[target])
+            if to_target != UNREACHABLE:
+                known = forward != UNREACHABLE
+                np.maximum(result, np.where(known, to_target - forward.astype(np.int64), 0), out=result)
+            if from_target != UNREACHABLE:
+                known = backward != UNREACHABLE
+                np.maximum(result, np.where(known, backward.astype(np.int64) - from_target, 0), out=result)
+        # both stored values are rounded by up to half a unit
+        return np.maximum(result - 1, 0) / float(SCALE)
+
+
+def reverse(graph):
+    """
+    Graph with all edges reversed, for the distances to a node
+    :param graph: graph_csr.CSRGraph
+    :return: graph_csr.CSRGraph held in memory
+    """
+    sources = np.repeat(np.arange(len(graph), dtype=np.int32), np.diff(graph.offsets))
+    order = np.argsort(graph.targets, kind='stable')
+    offsets = np.zeros(len(graph) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(graph.targets, minlength=len(graph)), out=offsets[1:])
+    return CSRGraph(graph.lat, graph.lon, graph.osmids, offsets, sources[order],
+                    np.asarray(graph.length)[order], np.asarray(graph.time)[order])
+
+
+def _pack(costs):
+    """
+    Private helper to store distances as uint32. Do not call from the outside.
+    :param costs: float64 array, inf for nodes that can not be reached
+    """
+    packed = np.full(len(costs), UNREACHABLE, dtype=np.uint32)
+    finite = np.isfinite(costs)
+    packed[finite] = np.minimum(np.round(costs[finite] * SCALE), UNREACHABLE - 1)
+    return packed
+
+
+def build(graph, count=16, weight='length', seed=0, verbose=False):
+    """
+    Selects landmarks by farthest point selection: starting from the node farthest from a random node, every next
+    landmark is the node farthest from all landmarks so far, so they end up spread along the border of the graph.
+    Each landmark costs a forward and a backward Dijkstra over the whole graph.
+    :param graph: graph_csr.CSRGraph
+    :param count: number of landmarks
+    :param weight: one of routing.WEIGHTS
+    :param seed: seed of the random start node
+    :param verbose: print the progress
+    :return: Landmarks
+    """
+    n = len(graph)
+    backward_graph = reverse(graph)
+    everything = range(n)
+    start = np.random.RandomState(seed).randint(n)
+
+    # distance of every node to the closest landmark so far, in the shorter of both directions. Nodes that no
+    # landmark reaches in either direction are never selected.
+    closest = np.minimum(one_to_many(graph, start, everything, weight),
+                         one_to_many(backward_graph, start, everything, weight))
+    nodes, forward, backward = [], [], []
+    for i in range(min(count, n)):
+        candidates = np.where(np.isfinite(closest), closest, -1.0)
+        landmark = int(np.argmax(candidates))
+        if nodes and candidates[landmark] <= 0:
+            break
+        distances = [one_to_many(g, landmark, everything, weight) for g in (graph, backward_graph)]
+        nodes.append(landmark)
+        forward.append(_pack(distances[0]))
+        backward.append(_pack(distances[1]))
+        distances = np.minimum(*distances)
+        closest = np.minimum(closest, distances) if len(nodes) > 1 else distances
+        if verbose:
+            print("{0}/{1} landmarks".format(i + 1, count))
+    return Landmarks(np.array(nodes, dtype=np.int32), np.array(forward), np.array(backward))
+
+
+def save_landmarks(landmarks, folder):
+    """
+    Stores landmarks as one .npy file per array
+    :param landmarks: Landmarks
+    :param folder: folder for the files, created if missing
+    """
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    for name in ARRAYS:
+        np.save(os.path.join(folder, name + '.npy'), np.ascontiguousarray(getattr(landmarks, name)))
+
+
+def load_landmarks(folder):
+    """
+    Memory maps landmarks written by save_landmarks()
+    :param folder: folder of the files
+    :return: Landmarks
+    """
+    return Landmarks(*[np.load(os.path.join(folder, name + '.npy'), mmap_mode='r') for name in ARRAYS])
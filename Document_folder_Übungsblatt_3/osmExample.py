@@ -1,52 +1,226 @@
-import matplotlib
-matplotlib.use('Qt5Agg')
-import networkx as nx
-import osmnx as ox
-import matplotlib.pyplot as plt
+import os
+import time
 
-# configure osmnx to cache the queries and log what it does
-ox.config(use_cache=True, log_console=True)
+# osmnx, networkx and matplotlib are only imported inside the functions that need them, so importing this
+# module is cheap and works without a display
 
 # use data from file
 load_from_file = True
 
-# get the positions of some locations
-wachsbleiche = ox.utils.geocode("Wachsbleiche 27, Osnabrück, Deutschland")
-harder_example = ox.utils.geocode("Stöppelweg 1, Lengerich, Deutschland")
-
-if load_from_file:
-    # load a graph from file
-    try:
-        G = ox.load_graphml('osnabrueck.graphml', folder='data')
-    except FileNotFoundError as e:
-        print(e)
-        print("fetching data from the web instead")
-        G = ox.graph_from_point(wachsbleiche, distance=30000, network_type='drive', simplify=True)
-else:
+# look up addresses that are not in the geocoding cache on the osm servers. Off by default, so jobs on machines
+# without network access never try to; enable it with GEOCODE_ONLINE=1 or geocode(..., online=True)
+geocode_online = os.environ.get('GEOCODE_ONLINE', '') == '1'
+
+DATA_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+START_ADDRESS = "Wachsbleiche 27, Osnabrück, Deutschland"
+TARGET_ADDRESS = "Stöppelweg 1, Lengerich, Deutschland"
+
+
+def _pyplot():
+    """
+    Imports pyplot on the first plot. Private helper, do not call from the outside
+    :return: the matplotlib.pyplot module
+    """
+    import matplotlib
+    if 'MPLBACKEND' not in os.environ:
+        matplotlib.use('Qt5Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def configure():
+    """
+    configure osmnx to cache the queries and log what it does. The address tags of the nodes are kept, so
+    geocode() can find addresses in a fetched graph.
+    """
+    import osmnx as ox
+    ox.config(use_cache=True, log_console=True,
+              useful_tags_node=['ref', 'highway', 'addr:street', 'addr:housenumber', 'addr:city', 'addr:country'])
+
+
+def _live_geocode(address):
+    """
+    Asks the osm servers for an address missing in the geocoding cache, osmnx is only configured (and imported)
+    here. Private helper, do not call from the outside
+    :return: (latitude, longitude)
+    """
+    from geocoding import live_geocoder
+    configure()
+    return live_geocoder(address)
+
+
+def geocode(addresses, online=geocode_online, folder=DATA_FOLDER, G=None):
+    """
+    get the positions of locations, from the geocoding cache in folder if they were looked up before
+    :param addresses: list of addresses as strings
+    :param online: True to ask the osm servers for addresses that are not cached
+    :param folder: folder of the cache file
+    :param G: optional networkx graph, the address tags of its nodes are added to the cache if an address is missing
+    :return: list of (latitude, longitude)
+    :raises KeyError: if an address is neither cached nor in G and online is False
+    """
+    from geocoding import Geocoder
+    path = os.path.join(folder, 'geocode.json')
+    geocoder = Geocoder(path, fallback=_live_geocode if online else None)
+    if G is not None and not all(a in geocoder for a in addresses):
+        geocoder.add_graph(G)
+    missing = [a for a in addresses if a not in geocoder]
+    if missing and not online:
+        raise KeyError("{0} not in the geocoding cache {1}, run once with GEOCODE_ONLINE=1 to look them up on the "
+                       "osm servers".format("; ".join(missing), path))
+    positions = geocoder.geocode_many(addresses)
+    geocoder.save()
+    return [tuple(p) for p in positions.tolist()]
+
+
+def load_graph(center, from_file=load_from_file, folder=DATA_FOLDER):
+    """
+    Loads the drive network around a position
+    :param center: (latitude, longitude) the graph is fetched around if it is not loaded from file
+    :param from_file: True to load osnabrueck.graphml from folder, False to fetch the data from the osm servers
+    :param folder: folder of the graphml file
+    :return: networkx MultiDiGraph
+    """
+    import osmnx as ox
+    if from_file:
+        # load a graph from file
+        try:
+            return ox.load_graphml('osnabrueck.graphml', folder=folder)
+        except FileNotFoundError as e:
+            print(e)
+            print("fetching data from the web instead")
     # fetch it from the osm servers and simplify it
-    G = ox.graph_from_point(wachsbleiche, distance=30000, network_type='drive', simplify=True)
+    configure()
+    return ox.graph_from_point(center, distance=30000, network_type='drive', simplify=True)
+
+
+def load_road_graph(center, folder=DATA_FOLDER):
+    """
+    Loads the drive network as memory mapped CSR arrays. The first run converts the graphml file (or the data
+    from the osm servers) once, later runs only map the arrays, which takes milliseconds.
+    :param center: (latitude, longitude) the graph is fetched around if there is no file
+    :param folder: folder of the graphml file and the converted arrays
+    :return: graph_csr.CSRGraph
+    """
+    from graph_csr import from_networkx, load_csr, save_csr
+    path = os.path.join(folder, 'osnabrueck_csr')
+    if not os.path.isdir(path):
+        save_csr(from_networkx(load_graph(center, folder=folder)), path)
+    return load_csr(path)
+
+
+def load_road_index(graph, folder=DATA_FOLDER):
+    """
+    Loads the spatial index of the converted road graph, it is built and stored next to the arrays on the first run
+    :param graph: graph_csr.CSRGraph returned by load_road_graph()
+    :param folder: folder of the converted arrays
+    :return: spatial_index.GridIndex
+    """
+    from spatial_index import build, load_index, save_index
+    path = os.path.join(folder, 'osnabrueck_csr', 'grid')
+    if not os.path.isdir(path):
+        save_index(build(graph), path)
+    return load_index(graph, path)
+
+
+def load_road_landmarks(graph, folder=DATA_FOLDER, weight='length'):
+    """
+    Loads the ALT landmarks of the converted road graph, they are selected and stored on the first run
+    :param graph: graph_csr.CSRGraph returned by load_road_graph()
+    :param folder: folder of the converted arrays
+    :param weight: one of routing.WEIGHTS
+    :return: landmarks.Landmarks
+    """
+    from landmarks import build, load_landmarks, save_landmarks
+    path = os.path.join(folder, 'osnabrueck_csr', 'landmarks_' + weight)
+    if not os.path.isdir(path):
+        save_landmarks(build(graph, weight=weight, verbose=True), path)
+    return load_landmarks(path)
+
+
+def load_road_hierarchy(folder=DATA_FOLDER, weight='length'):
+    """
+    Loads the contraction hierarchy of the converted road graph. It is built offline with
+    python contraction.py data/osnabrueck_csr, because that takes minutes.
+    :param folder: folder of the converted arrays
+    :param weight: one of routing.WEIGHTS
+    :return: contraction.ContractionHierarchy, None if it was not built yet
+    """
+    from contraction import load_hierarchy
+    path = os.path.join(folder, 'osnabrueck_csr', 'ch_' + weight)
+    return load_hierarchy(path) if os.path.isdir(path) else None
+
+
+def plot_route(G, route, start, target):
+    """
+    plots the graph with the route and the start and end positions
+    :param G: the graph
+    :param route: list of nodes, plots just the graph if empty
+    :param start: (latitude, longitude) of the start
+    :param target: (latitude, longitude) of the target
+    :return: (fig, ax) of the plot
+    """
+    import osmnx as ox
+    _pyplot()
+    if route:
+        fig, ax = ox.plot_graph_route(G, route, show=False, close=False, axis_off=False, node_color='#66ccff')
+    else:
+        # plot just the graph
+        fig, ax = ox.plot_graph(G, show=False, close=False, axis_off=False, annotate=False)
+
+    # plot start and end positions of the route (reverse, because the coordinates are returned in the wrong order for matplotlib!)
+    ax.scatter(*reversed(start), c='r', s=15, zorder=3)
+    ax.scatter(*reversed(target), c='g', s=15, zorder=3)
+    return fig, ax
+
+
+def main():
+    from routing import astar, dijkstra
+
+    # the graph is needed for the plot anyway. If it is stored, it is loaded first, so the address tags of its
+    # nodes can stand in for addresses that are not cached yet
+    G = None
+    if load_from_file and os.path.isfile(os.path.join(DATA_FOLDER, 'osnabrueck.graphml')):
+        G = load_graph(None)
+
+    # get the positions of some locations
+    wachsbleiche, harder_example = geocode([START_ADDRESS, TARGET_ADDRESS], G=G)
+
+    graph = load_road_graph(wachsbleiche)
+
+    # get the closest nodes in the graph for all positions in one call
+    positions = [wachsbleiche, harder_example]
+    wachsbleiche_node, harder_example_node = load_road_index(graph).nearest_nodes(*zip(*positions)).tolist()
 
-# get the closest nodes in the graph for all positions
-wachsbleiche_node = ox.get_nearest_node(G, wachsbleiche)
-harder_example_node = ox.get_nearest_node(G, harder_example)
+    # get the shortest route, the straight line distance guides the search towards the target
+    route, distance, settled = astar(graph, wachsbleiche_node, harder_example_node)
+    print("route: {0:.0f} m, {1} nodes settled (dijkstra: {2})".format(
+        distance, settled, dijkstra(graph, wachsbleiche_node, harder_example_node)[2]))
 
-# get a route (dijkstra; not the best!!!)
-route = nx.shortest_path(G, wachsbleiche_node, harder_example_node)
+    # the landmark distances bound the remaining distance much tighter than the straight line
+    bounds = load_road_landmarks(graph).bounds(harder_example_node)
+    print("ALT: {0} nodes settled".format(astar(graph, wachsbleiche_node, harder_example_node, heuristic=bounds)[2]))
 
-if route:
-    fig, ax = ox.plot_graph_route(G, route, show=False, close=False, axis_off=False, node_color='#66ccff')
-else:
-    # plot just the graph
-    fig, ax = ox.plot_graph(G, show=False, close=False, axis_off=False, annotate=False)
+    # the hierarchy only searches upwards from both ends, if it was built
+    ch = load_road_hierarchy()
+    if ch is not None:
+        start = time.perf_counter()
+        route, distance, settled = ch.query(wachsbleiche_node, harder_example_node)
+        print("contraction hierarchy: {0:.0f} m, {1} nodes settled, {2:.2f} ms".format(
+            distance, settled, 1000 * (time.perf_counter() - start)))
 
-# plot start and end positions of the route (reverse, because the coordinates are returned in the wrong order for matplotlib!)
-ax.scatter(*reversed(wachsbleiche), c='r', s=15, zorder=3)
-ax.scatter(*reversed(harder_example), c='g', s=15, zorder=3)
+    # the plot needs the networkx graph
+    if G is None:
+        G = load_graph(wachsbleiche)
+    plot_route(G, graph.osmids[route].tolist() if route else [], wachsbleiche, harder_example)
 
-# print edge information
-for u,v,d in list(G.edges(data=True))[:100]:
-    print(u,v,d)
+    # print edge information
+    for u,v,d in list(G.edges(data=True))[:100]:
+        print(u,v,d)
 
-plt.show()
+    _pyplot().show()
 
 
+if __name__ == "__main__":
+    main()
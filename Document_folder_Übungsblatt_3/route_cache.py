@@ -0,0 +1,191 @@
+import hashlib
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from graph_csr import ARRAYS
+from routing import astar
+
+
+def fingerprint(folder):
+    """
+    Fingerprint of a graph stored with graph_csr.save_csr(). It changes whenever one of the files is rewritten,
+    the files are not read.
+    :param folder: folder of the graph
+    :return: hex string
+    """
+    digest = hashlib.sha1()
+    for name in ARRAYS:
+        info = os.stat(os.path.join(folder, name + '.npy'))
+        digest.update("{0}:{1}:{2};".format(name, info.st_size, info.st_mtime_ns).encode())
+    return digest.hexdigest()
+
+
+class RouteCache(object):
+    """
+    Cache of computed routes of one stored graph, keyed by (graph fingerprint, source, target, weight). The memory
+    tier keeps the most recently used routes up to a number of route nodes, the least recently used ones are
+    evicted first. The optional SQLite tier keeps all routes across restarts. The fingerprint is checked again on
+    every miss and at least every check_interval seconds, so routes of an older version of the graph are dropped
+    soon after the files change.
+    """
+    def __init__(self, folder, capacity=1000000, path=None, check_interval=1.0):
+        """
+        Constructor.
+        :param folder: folder of the graph, see graph_csr.save_csr()
+        :param capacity: number of route nodes the memory tier holds
+        :param path: SQLite file of the disk tier, one per graph, None to keep the routes in memory only
+        :param check_interval: seconds between two checks of the graph files on memory hits, 0 checks every lookup
+        """
+        self.folder = folder
+        self.capacity = capacity
+        self.check_interval = check_interval
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.__entries = OrderedDict()
+        self.__size = 0
+        self.__fingerprint = fingerprint(folder)
+        self.__checked = time.monotonic()
+        self.__db = None
+        if path is not None:
+            self.__db = sqlite3.connect(path)
+            self.__db.execute("CREATE TABLE IF NOT EXISTS routes (fingerprint TEXT, source INTEGER, target INTEGER, "
+                              "weight TEXT, cost REAL, route BLOB, PRIMARY KEY (fingerprint, source, target, weight))")
+            self.__purge()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    @property
+    def size(self):
+        """
+        :return: number of route nodes in the memory tier
+        """
+        return self.__size
+
+    def get(self, source, target, weight='length'):
+        """
+        Looks up a route, first in memory then on disk
+        :param source: index of the start node
+        :param target: index of the target node
+        :param weight: one of routing.WEIGHTS
+        :return: (list of node indices or None, cost) as returned by routing.astar(), None if it is not cached
+        """
+        if time.monotonic() - self.__checked >= self.check_interval:
+            self.__check()
+        key = (int(source), int(target), weight)
+        entry = self.__entries.get(key)
+        if entry is not None:
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return (list(entry[0]) if entry[0] is not None else None), entry[1]
+        # a miss costs a search or a query anyway, the stat calls do not matter here
+        self.__check()
+        if self.__db is not None:
+            row = self.__db.execute("SELECT route, cost FROM routes WHERE fingerprint = ? AND source = ? AND "
+                                    "target = ? AND weight = ?", (self.__fingerprint,) + key).fetchone()
+            if row is not None:
+                route = np.frombuffer(row[0], dtype=np.int32).tolist() if row[0] is not None else None
+                self.__remember(key, route, row[1])
+                self.disk_hits += 1
+                return route, row[1]
+        self.misses += 1
+        return None
+
+    def put(self, source, target, weight, route, cost):
+        """
+        Stores a route in both tiers
+        :param source: index of the start node
+        :param target: index of the target node
+        :param weight: one of routing.WEIGHTS
+        :param route: list of node indices, None if the target can not be reached
+        :param cost: cost of the route
+        """
+        self.__check()
+        key = (int(source), int(target), weight)
+        self.__remember(key, route, cost)
+        if self.__db is not None:
+            blob = np.asarray(route, dtype=np.int32).tobytes() if route is not None else None
+            with self.__db:
+                self.__db.execute("INSERT OR REPLACE INTO routes VALUES (?, ?, ?, ?, ?, ?)",
+                                  (self.__fingerprint,) + key + (float(cost), blob))
+
+    def route(self, graph, source, target, weight='length', search=astar):
+        """
+        Cached route search
+        :param graph: the graph_csr.CSRGraph loaded from the folder of the cache
+        :param source: index of the start node
+        :param target: index of the target node
+        :param weight: one of routing.WEIGHTS
+        :param search: search function with the signature of routing.astar()
+        :return: (list of node indices or None, cost)
+        """
+        cached = self.get(source, target, weight)
+        if cached is not None:
+            return cached
+        route, cost = search(graph, source, target, weight)[:2]
+        self.put(source, target, weight, route, cost)
+        return route, cost
+
+    def clear(self):
+        """
+        Empties the memory tier, the disk tier is kept
+        """
+        self.__entries.clear()
+        self.__size = 0
+
+    def close(self):
+        """
+        Closes the disk tier
+        """
+        if self.__db is not None:
+            self.__db.close()
+            self.__db = None
+
+    def as_dict(self):
+        """
+        :return: the counters as a dict
+        """
+        return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses,
+                'evictions': self.evictions, 'entries': len(self.__entries), 'size': self.__size}
+
+    def __remember(self, key, route, cost):
+        """
+        Private helper to add a route to the memory tier and evict the least recently used ones. Do not call from
+        the outside.
+        """
+        old = self.__entries.pop(key, None)
+        if old is not None:
+            self.__size -= len(old[0] or ())
+        route = tuple(route) if route is not None else None
+        self.__entries[key] = (route, cost)
+        self.__size += len(route or ())
+        while self.__size > self.capacity and len(self.__entries) > 1:
+            _, (evicted, _) = self.__entries.popitem(last=False)
+            self.__size -= len(evicted or ())
+            self.evictions += 1
+
+    def __check(self):
+        """
+        Private helper to drop all routes if the graph files changed. Do not call from the outside.
+        """
+        self.__checked = time.monotonic()
+        current = fingerprint(self.folder)
+        if current != self.__fingerprint:
+            self.__fingerprint = current
+            self.clear()
+            if self.__db is not None:
+                self.__purge()
+
+    def __purge(self):
+        """
+        Private helper to delete the routes of other graph versions from the disk tier. Do not call from the outside.
+        """
+        with self.__db:
+            self.__db.execute("DELETE FROM routes WHERE fingerprint != ?", (self.__fingerprint,))
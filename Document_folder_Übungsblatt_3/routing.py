@@ -0,0 +1,150 @@
+import heapq
+import math
+
+import numpy as np
+
+# same radius osmnx uses for the edge lengths, so the straight line is never longer than an edge
+EARTH_RADIUS = 6371009.0
+
+# speed in km/h for edges without a usable maxspeed tag
+DEFAULT_SPEED = 50.0
+
+# implicit maxspeed values used in Germany
+SPEED_ZONES = {'DE:urban': 50.0, 'DE:rural': 100.0, 'DE:motorway': 130.0, 'DE:living_street': 7.0,
+               'DE:bicycle_road': 30.0, 'none': 130.0, 'walk': 7.0}
+
+WEIGHTS = ('length', 'time')
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Great circle distance between two positions
+    :param lat1: latitude of the first position in degrees
+    :param lon1: longitude of the first position in degrees
+    :param lat2: latitude of the second position in degrees
+    :param lon2: longitude of the second position in degrees
+    :return: distance in m
+    """
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    a = math.sin((phi2 - phi1) / 2) ** 2 + \
+        math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_array(lat, lon, lat0, lon0):
+    """
+    Great circle distances of many positions to one position, same formula as haversine()
+    :param lat: array of latitudes in degrees
+    :param lon: array of longitudes in degrees
+    :param lat0: latitude of the position in degrees
+    :param lon0: longitude of the position in degrees
+    :return: float64 array of distances in m
+    """
+    phi = np.radians(lat)
+    phi0 = math.radians(lat0)
+    a = np.sin((phi - phi0) / 2) ** 2 + \
+        np.cos(phi) * math.cos(phi0) * np.sin(np.radians(np.asarray(lon) - lon0) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def parse_maxspeed(value):
+    """
+    Converts an OSM maxspeed tag into km/h
+    :param value: tag value, e.g. '50', '30 mph', 'DE:urban' or a list of them (simplified edges)
+    :return: speed in km/h, DEFAULT_SPEED if the value is missing or unknown
+    """
+    if isinstance(value, (list, tuple)):
+        speeds = [parse_maxspeed(v) for v in value]
+        return min(speeds) if speeds else DEFAULT_SPEED
+    if value is None:
+        return DEFAULT_SPEED
+    value = str(value).strip()
+    if value in SPEED_ZONES:
+        return SPEED_ZONES[value]
+    try:
+        if value.endswith('mph'):
+            return float(value[:-3]) * 1.609344
+        return float(value.split(';')[0])
+    except ValueError:
+        return DEFAULT_SPEED
+
+
+def edge_cost(data, weight='length'):
+    """
+    Cost of an edge
+    :param data: edge attributes of the graph
+    :param weight: 'length' for metres or 'time' for seconds at the allowed speed
+    :return: cost of the edge
+    """
+    length = float(data.get('length', 0.0))
+    if weight == 'length':
+        return length
+    return length / (parse_maxspeed(data.get('maxspeed')) / 3.6)
+
+
+def astar(graph, source, target, weight='length', heuristic=True):
+    """
+    A* search from source to target. The heuristic is the straight line distance to the target, divided by the
+    fastest speed of the graph for travel times, so it never overestimates and the route is optimal.
+    :param graph: graph_csr.CSRGraph, the arrays are read through memoryviews, so memory mapped graphs are not
+                  copied
+    :param source: index of the start node
+    :param target: index of the target node
+    :param weight: one of WEIGHTS, 'length' for the shortest and 'time' for the fastest route
+    :param heuristic: False for plain Dijkstra (for comparisons), or an array of lower bounds of the cost to the
+                      target per node instead of the straight line, e.g. landmarks.Landmarks.bounds()
+    :return: (list of node indices or None if target can not be reached, cost in m or s, number of settled nodes)
+    """
+    source, target = int(source), int(target)
+    offsets = memoryview(graph.offsets)
+    targets = memoryview(graph.targets)
+    costs = memoryview(graph.weights(weight))
+    bounds = None
+    if heuristic is not True and heuristic is not False:
+        bounds = memoryview(np.ascontiguousarray(heuristic, dtype=np.float64))
+        heuristic = False
+    if heuristic:
+        scale = 1.0 if weight == 'length' else 1.0 / graph.max_speed()
+        goal_lat = float(graph.lat[target])
+        goal_lon = float(graph.lon[target])
+        lat = memoryview(graph.lat)
+        lon = memoryview(graph.lon)
+
+    best = {source: 0.0}
+    parents = {source: -1}
+    closed = set()
+    queue = [(0.0, 0.0, source)]
+    while queue:
+        _, cost, node = heapq.heappop(queue)
+        if node in closed:
+            continue
+        closed.add(node)
+        if node == target:
+            route = []
+            while node >= 0:
+                route.append(node)
+                node = parents[node]
+            route.reverse()
+            return route, cost, len(closed)
+
+        for e in range(offsets[node], offsets[node + 1]):
+            child = targets[e]
+            new_cost = cost + costs[e]
+            if new_cost < best.get(child, float('inf')) and child not in closed:
+                best[child] = new_cost
+                parents[child] = node
+                if bounds is not None:
+                    h = bounds[child]
+                else:
+                    h = scale * haversine(lat[child], lon[child], goal_lat, goal_lon) if heuristic else 0.0
+                heapq.heappush(queue, (new_cost + h, new_cost, child))
+    return None, float('inf'), len(closed)
+
+
+def dijkstra(graph, source, target, weight='length'):
+    """
+    Same as astar() without the heuristic
+    :return: (list of node indices or None, cost in m or s, number of settled nodes)
+    """
+    return astar(graph, source, target, weight, heuristic=False)
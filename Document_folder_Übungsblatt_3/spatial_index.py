@@ -0,0 +1,250 @@
+import math
+import os
+
+import numpy as np
+
+from routing import EARTH_RADIUS
+
+# arrays of a stored index, one .npy file each. meta holds lat0, xmin, ymin, cell size, nx and ny
+ARRAYS = ('meta', 'node_offsets', 'node_items', 'edge_offsets', 'edge_items')
+
+
+def project(lat, lon, lat0):
+    """
+    Equirectangular projection around a latitude, accurate enough for the few tens of km of a city graph
+    :param lat: array of latitudes in degrees
+    :param lon: array of longitudes in degrees
+    :param lat0: latitude of the projection in degrees
+    :return: (x, y) float64 arrays in m
+    """
+    x = EARTH_RADIUS * math.cos(math.radians(lat0)) * np.radians(np.asarray(lon, dtype=np.float64))
+    y = EARTH_RADIUS * np.radians(np.asarray(lat, dtype=np.float64))
+    return x, y
+
+
+class GridIndex(object):
+    """
+    Bucket grid over the projected nodes and edges of a graph_csr.CSRGraph. Every grid cell lists the nodes inside
+    it and the edges whose bounding box touches it, in the same offsets/items layout as the graph edges. A query
+    looks at the cells in rings around the cell of a position until the closest item found so far is nearer than
+    any cell of the next ring, all positions of a batch go ring by ring together.
+    """
+    def __init__(self, graph, meta, node_offsets, node_items, edge_offsets, edge_items):
+        """
+        Constructor, use build() or load_index() to get one
+        :param graph: the indexed graph_csr.CSRGraph
+        :param meta: float64 array lat0, xmin, ymin, cell size in m, number of columns, number of rows
+        :param node_offsets: int64 array of cells + 1 offsets into node_items
+        :param node_items: int32 node indices sorted by cell
+        :param edge_offsets: int64 array of cells + 1 offsets into edge_items
+        :param edge_items: int32 edge indices sorted by cell
+        """
+        self.graph = graph
+        self.meta = meta
+        self.node_offsets = node_offsets
+        self.node_items = node_items
+        self.edge_offsets = edge_offsets
+        self.edge_items = edge_items
+
+        self.lat0, self.xmin, self.ymin, self.cell = (float(v) for v in meta[:4])
+        self.nx, self.ny = int(meta[4]), int(meta[5])
+        self.x, self.y = project(graph.lat, graph.lon, self.lat0)
+        self.sources = np.repeat(np.arange(len(graph), dtype=np.int32), np.diff(graph.offsets))
+        self.targets = np.asarray(graph.targets)
+
+    def nearest_nodes(self, lats, lons, return_dist=False):
+        """
+        Closest node for every position
+        :param lats: latitudes in degrees (array or scalar)
+        :param lons: longitudes in degrees (array or scalar)
+        :param return_dist: also return the distances
+        :return: int array of node indices (and float64 array of distances in m)
+        """
+        px, py = self.__positions(lats, lons)
+        nodes, dist = self.__query(px, py, self.node_offsets, self.node_items, self.__node_distance)
+        return (nodes, dist) if return_dist else nodes
+
+    def nearest_edges(self, lats, lons, return_dist=False):
+        """
+        Closest edge for every position. Of the two directions of a road the one found first is returned.
+        :param lats: latitudes in degrees (array or scalar)
+        :param lons: longitudes in degrees (array or scalar)
+        :param return_dist: also return the distances
+        :return: (source nodes, target nodes, position of the closest point along the edge from 0 to 1)
+                 (and float64 array of distances in m)
+        """
+        px, py = self.__positions(lats, lons)
+        edges, dist = self.__query(px, py, self.edge_offsets, self.edge_items, self.__edge_distance)
+        _, fraction = self.__edge_distance(px, py, edges, fraction=True)
+        result = (self.sources[edges], self.targets[edges], fraction)
+        return result + (dist,) if return_dist else result
+
+    def __positions(self, lats, lons):
+        """
+        Private helper to project the query positions. Do not call from the outside.
+        """
+        return project(np.atleast_1d(lats), np.atleast_1d(lons), self.lat0)
+
+    def __node_distance(self, px, py, items):
+        """
+        Private helper, distances of the positions to the nodes. Do not call from the outside.
+        """
+        return np.hypot(self.x[items] - px, self.y[items] - py)
+
+    def __edge_distance(self, px, py, items, fraction=False):
+        """
+        Private helper, distances of the positions to the edge segments. Do not call from the outside.
+        :param fraction: also return the position of the closest points along the edges
+        """
+        u, v = self.sources[items], self.targets[items]
+        ax, ay = self.x[u], self.y[u]
+        dx, dy = self.x[v] - ax, self.y[v] - ay
+        length2 = dx * dx + dy * dy
+        t = np.where(length2 > 0, (px - ax) * dx + (py - ay) * dy, 0.0) / np.where(length2 > 0, length2, 1.0)
+        t = np.clip(t, 0.0, 1.0)
+        dist = np.hypot(ax + t * dx - px, ay + t * dy - py)
+        return (dist, t) if fraction else dist
+
+    def __query(self, px, py, offsets, items, distance):
+        """
+        Private helper for the ring search. Do not call from the outside.
+        :param distance: function (px, py, items) -> distances of the positions to the items
+        :return: (closest item per position, its distance)
+        """
+        if len(items) == 0:
+            raise ValueError("the index is empty")
+        m = len(px)
+        best = np.full(m, np.inf)
+        found = np.full(m, -1, dtype=np.int64)
+
+        # positions outside of the grid search from the closest point of the grid. Anything outside of the cells
+        # searched so far is at least as far from the position as from that point.
+        gx = np.clip(px, self.xmin, self.xmin + self.nx * self.cell)
+        gy = np.clip(py, self.ymin, self.ymin + self.ny * self.cell)
+        cx = np.clip(np.floor((gx - self.xmin) / self.cell), 0, self.nx - 1).astype(np.int64)
+        cy = np.clip(np.floor((gy - self.ymin) / self.cell), 0, self.ny - 1).astype(np.int64)
+        # distance of the clamped point to the border of its own cell
+        margin = np.minimum(np.minimum(gx - self.xmin - cx * self.cell, self.xmin + (cx + 1) * self.cell - gx),
+                            np.minimum(gy - self.ymin - cy * self.cell, self.ymin + (cy + 1) * self.cell - gy))
+        active = np.arange(m)
+        r = 0
+        while len(active):
+            if r == 0:
+                dx, dy = np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64)
+            else:
+                side = np.arange(-r, r + 1, dtype=np.int64)
+                inner = side[1:-1]
+                dx = np.concatenate((side, side, np.full(len(inner), -r), np.full(len(inner), r)))
+                dy = np.concatenate((np.full(len(side), -r), np.full(len(side), r), inner, inner))
+
+            # all (position, cell) pairs of the ring that lie inside the grid, grouped by position
+            qx = (cx[active, None] + dx).ravel()
+            qy = (cy[active, None] + dy).ravel()
+            point = np.repeat(active, len(dx))
+            inside = (qx >= 0) & (qx < self.nx) & (qy >= 0) & (qy < self.ny)
+            cells = qy[inside] * self.nx + qx[inside]
+            point = point[inside]
+            starts = np.asarray(offsets[cells])
+            counts = np.asarray(offsets[cells + 1]) - starts
+
+            # expand to (position, item) pairs and keep the first closest item per position
+            if counts.sum():
+                point = np.repeat(point, counts)
+                first = np.repeat(np.cumsum(counts) - counts, counts)
+                candidates = np.asarray(items)[np.repeat(starts, counts) + np.arange(len(point)) - first]
+                dist = distance(px[point], py[point], candidates)
+                head = np.flatnonzero(np.concatenate(([True], point[1:] != point[:-1])))
+                group = np.cumsum(np.concatenate(([False], point[1:] != point[:-1])))
+                low = np.minimum.reduceat(dist, head)
+                hit = np.flatnonzero(dist == low[group])
+                hit = hit[np.concatenate(([True], group[hit][1:] != group[hit][:-1]))]
+                point, candidates, dist = point[hit], candidates[hit], dist[hit]
+                better = dist < best[point]
+                best[point[better]] = dist[better]
+                found[point[better]] = candidates[better]
+
+            # done if nothing in the next ring can be closer or the ring has covered the whole grid
+            covered = np.maximum(np.maximum(cx[active], self.nx - 1 - cx[active]),
+                                 np.maximum(cy[active], self.ny - 1 - cy[active])) <= r
+            active = active[(best[active] > margin[active] + r * self.cell) & ~covered]
+            r += 1
+        return found, best
+
+
+def _cells(index_x, index_y, counts_x, counts_y):
+    """
+    Private helper to expand rectangles of cells into single cells. Do not call from the outside.
+    :param index_x: first column per rectangle
+    :param index_y: first row per rectangle
+    :param counts_x: columns per rectangle
+    :param counts_y: rows per rectangle
+    :return: (rectangle index, column, row) per cell
+    """
+    counts = counts_x * counts_y
+    owner = np.repeat(np.arange(len(counts)), counts)
+    local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owner, index_x[owner] + local % counts_x[owner], index_y[owner] + local // counts_x[owner]
+
+
+def _to_csr(cells, items, num_cells):
+    """
+    Private helper to sort items into cell buckets. Do not call from the outside.
+    :return: offsets, items
+    """
+    order = np.argsort(cells, kind='stable')
+    offsets = np.zeros(num_cells + 1, dtype=np.int64)
+    np.cumsum(np.bincount(cells, minlength=num_cells), out=offsets[1:])
+    return offsets, items[order].astype(np.int32)
+
+
+def build(graph, per_cell=4.0):
+    """
+    Builds the index of a graph
+    :param graph: graph_csr.CSRGraph
+    :param per_cell: average number of nodes per cell
+    :return: GridIndex
+    """
+    n = len(graph)
+    lat0 = float(np.mean(graph.lat)) if n else 0.0
+    x, y = project(graph.lat, graph.lon, lat0)
+    xmin, ymin = (float(x.min()), float(y.min())) if n else (0.0, 0.0)
+    width, height = (float(x.max()) - xmin, float(y.max()) - ymin) if n else (0.0, 0.0)
+    cell = math.sqrt(width * height * per_cell / n) if width > 0 and height > 0 else max(width, height, 1.0)
+    nx = int(width // cell) + 1
+    ny = int(height // cell) + 1
+    meta = np.array([lat0, xmin, ymin, cell, nx, ny], dtype=np.float64)
+
+    col = np.minimum((x - xmin) // cell, nx - 1).astype(np.int64)
+    row = np.minimum((y - ymin) // cell, ny - 1).astype(np.int64)
+    node_offsets, node_items = _to_csr(row * nx + col, np.arange(n), nx * ny)
+
+    # an edge goes into every cell of its bounding box
+    sources = np.repeat(np.arange(n), np.diff(graph.offsets))
+    targets = np.asarray(graph.targets)
+    col0, col1 = np.minimum(col[sources], col[targets]), np.maximum(col[sources], col[targets])
+    row0, row1 = np.minimum(row[sources], row[targets]), np.maximum(row[sources], row[targets])
+    edges, ecol, erow = _cells(col0, row0, col1 - col0 + 1, row1 - row0 + 1)
+    edge_offsets, edge_items = _to_csr(erow * nx + ecol, edges, nx * ny)
+    return GridIndex(graph, meta, node_offsets, node_items, edge_offsets, edge_items)
+
+
+def save_index(index, folder):
+    """
+    Stores an index as one .npy file per array, usually next to the arrays of its graph
+    :param index: GridIndex
+    :param folder: folder for the files, created if missing
+    """
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    for name in ARRAYS:
+        np.save(os.path.join(folder, name + '.npy'), np.ascontiguousarray(getattr(index, name)))
+
+
+def load_index(graph, folder):
+    """
+    Memory maps an index written by save_index()
+    :param graph: the graph the index was built for
+    :param folder: folder of the files
+    :return: GridIndex
+    """
+    return GridIndex(graph, *[np.load(os.path.join(folder, name + '.npy'), mmap_mode='r') for name in ARRAYS])
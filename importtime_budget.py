@@ -0,0 +1,74 @@
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# core modules per exercise folder, they must import with numpy alone
+CORE_MODULES = {
+    'Document_folder_Übungsblatt_1': ('pegboard', 'peg_bitboard', 'peg_solver', 'peg_parallel', 'peg_playout',
+                                      'peg_count'),
+    'Document_folder_Übungsblatt_2': ('aufgabe2.3.py', 'sliding_puzzle', 'puzzle_batch', 'puzzle_pdb',
+                                      'puzzle_solver', 'puzzle_table'),
+    'Document_folder_Übungsblatt_3': ('osmExample', 'routing', 'graph_csr', 'contraction',
+                                      'spatial_index', 'distance_matrix', 'landmarks',
+                                      'route_cache', 'geocoding'),
+}
+
+# packages that are only allowed to load when something is plotted or a map is fetched
+LAZY_PACKAGES = ('matplotlib', 'osmnx', 'networkx', 'PIL')
+
+
+def measure(folder, module):
+    """
+    Imports a module in a fresh interpreter with python -X importtime
+    :param folder: folder of the module, used as working directory
+    :param module: module name, or a file name for scripts that can not be imported by name (like aufgabe2.3.py)
+    :return: (total import time in ms, set of all imported top level packages)
+    """
+    if module.endswith('.py'):
+        code = "import runpy; runpy.run_path({0!r}, run_name='budget')".format(module)
+    else:
+        code = "import {0}".format(module)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=os.path.join(ROOT, folder),
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if result.returncode != 0:
+        raise RuntimeError("importing {0} failed:\n{1}".format(module, result.stderr))
+
+    # lines look like "import time:   self [us] | cumulative | imported package", nested imports are indented
+    total = 0
+    packages = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        packages.add(name.strip().split('.')[0])
+        if not name[1:].startswith(' '):
+            total += int(cumulative)
+    return total / 1000.0, packages
+
+
+def check(budget):
+    """
+    Measures all core modules
+    :param budget: allowed import time per module in ms, including numpy
+    :return: True if all modules are within the budget and none of them imports a lazy package
+    """
+    ok = True
+    for folder, modules in sorted(CORE_MODULES.items()):
+        for module in modules:
+            ms, packages = measure(folder, module)
+            eager = sorted(p for p in LAZY_PACKAGES if p in packages)
+            failed = ms > budget or eager
+            ok = ok and not failed
+            print("{0:<6} {1:>8.1f} ms  {2}/{3}{4}".format('FAIL' if failed else 'ok', ms, folder, module,
+                                                          "  imports " + ", ".join(eager) if eager else ""))
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checks the import time of the core modules")
+    parser.add_argument('--budget', type=float, default=250.0, help="allowed import time per module in ms")
+    args = parser.parse_args()
+    sys.exit(0 if check(args.budget) else 1)